@@ -0,0 +1,117 @@
+# Minimal in-process MQTT 3.1.1 broker stand-in for the simulator and
+# benchmarks. Serves a single client over loopback: accepts CONNECT,
+# SUBSCRIBE, UNSUBSCRIBE, PINGREQ, PUBLISH (QoS 0/1) and DISCONNECT, and lets
+# the host side push PUBLISH packets to the subscriber. Topic filters are not
+# matched: everything published is delivered.
+import asyncio
+import struct
+
+
+def encode_length(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def publish_packet(topic, payload, qos=0, pid=1, retain=False):
+    if isinstance(topic, str):
+        topic = topic.encode("utf-8")
+    body = struct.pack("!H", len(topic)) + topic
+    if qos:
+        body += struct.pack("!H", pid)
+    body += payload
+    return bytes((0x30 | qos << 1 | retain,)) + encode_length(len(body)) + body
+
+
+class Broker:
+    def __init__(self):
+        self.port = None
+        self.subscribed = asyncio.Event()
+        self.published = []  # (topic, payload) received from the client
+        self.pubacks = 0  # PUBACKs received for QoS 1 deliveries
+        self.duplicates = 0  # Publishes received with the DUP flag (resent)
+        self.withhold = 0  # PUBACKs not to send, to test retransmission
+        self._writer = None
+        self._server = None
+        self._pid = 0
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._server = await asyncio.start_server(self._serve, host, port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._server.close()
+        await self._server.wait_closed()
+
+    def drop(self):  # Lose the client's connection; the server keeps listening
+        self._writer.close()
+
+    # Deliver a message to the connected client. Returns once written.
+    async def send(self, topic, payload, qos=0, retain=False):
+        pid = 0
+        if qos:
+            self._pid = self._pid % 65535 + 1
+            pid = self._pid
+        self._writer.write(publish_packet(topic, payload, qos, pid, retain))
+        await self._writer.drain()
+
+    async def _serve(self, reader, writer):
+        self._writer = writer
+        try:
+            while True:
+                head = await reader.readexactly(1)
+                n = 0
+                sh = 0
+                while True:
+                    b = (await reader.readexactly(1))[0]
+                    n |= (b & 0x7F) << sh
+                    sh += 7
+                    if not b & 0x80:
+                        break
+                body = await reader.readexactly(n) if n else b""
+                op = head[0] & 0xF0
+                if op == 0x10:  # CONNECT
+                    writer.write(b"\x20\x02\x00\x00")
+                elif op == 0x80:  # SUBSCRIBE: grant QoS 1 for each filter
+                    pid = body[:2]
+                    filters = 0
+                    i = 2
+                    while i < len(body):
+                        i += 2 + struct.unpack_from("!H", body, i)[0] + 1
+                        filters += 1
+                    writer.write(bytes((0x90,)) + encode_length(2 + filters) + pid + b"\x01" * filters)
+                    self.subscribed.set()
+                elif op == 0xA0:  # UNSUBSCRIBE
+                    writer.write(b"\xb0\x02" + body[:2])
+                elif op == 0xC0:  # PINGREQ
+                    writer.write(b"\xd0\x00")
+                elif op == 0x30:  # PUBLISH
+                    qos = head[0] >> 1 & 3
+                    tlen = struct.unpack_from("!H", body)[0]
+                    topic = body[2:2 + tlen]
+                    i = 2 + tlen
+                    if head[0] & 0x08:
+                        self.duplicates += 1
+                    if qos:
+                        if self.withhold:  # Lost: the client must resend
+                            self.withhold -= 1
+                        else:
+                            writer.write(b"\x40\x02" + body[i:i + 2])
+                        i += 2
+                    self.published.append((topic, body[i:]))
+                elif op == 0x40:  # PUBACK
+                    self.pubacks += 1
+                elif op == 0xE0:  # DISCONNECT
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
@@ -0,0 +1,35 @@
+# Host stand-in for the Interstate75 driver, backed by picographics.PicoGraphics.
+from picographics import PicoGraphics
+
+SWITCH_A = 0
+SWITCH_B = 1
+
+
+class Interstate75:
+    DISPLAY_INTERSTATE75_32X32 = (32, 32)
+    DISPLAY_INTERSTATE75_64X32 = (64, 32)
+    DISPLAY_INTERSTATE75_96X32 = (96, 32)
+    DISPLAY_INTERSTATE75_128X32 = (128, 32)
+    DISPLAY_INTERSTATE75_64X64 = (64, 64)
+    DISPLAY_INTERSTATE75_128X64 = (128, 64)
+    DISPLAY_INTERSTATE75_192X64 = (192, 64)
+    DISPLAY_INTERSTATE75_256X64 = (256, 64)
+    DISPLAY_INTERSTATE75_128X128 = (128, 128)
+
+    def __init__(self, display, **_):
+        self.width, self.height = display
+        self.display = PicoGraphics(self.width, self.height)
+        self.updates = 0  # Number of update() calls
+        self.on_update = None  # Optional callback(graphics), e.g. to save frames
+        self.led = (0, 0, 0)
+
+    def update(self, graphics=None):
+        self.updates += 1
+        if self.on_update is not None:
+            self.on_update(graphics or self.display)
+
+    def set_led(self, r, g, b):
+        self.led = (r, g, b)
+
+    def switch_pressed(self, switch):
+        return False
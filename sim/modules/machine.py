@@ -0,0 +1,27 @@
+# Host stand-in for the MicroPython machine module.
+import sys
+
+
+def unique_id():
+    return b"\x00sim\x00\x00"
+
+
+def reset():
+    sys.exit("machine.reset()")
+
+
+def freq(*_):
+    return 125000000
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, pin, mode=None, value=0):
+        self._value = value
+
+    def __call__(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
@@ -0,0 +1,23 @@
+# Host stand-in for the micropython module. Native code emitters run as plain
+# Python; viper pointer casts are provided as builtins.
+import builtins
+
+
+def const(x):
+    return x
+
+
+def native(f):
+    return f
+
+
+viper = native
+
+
+def mem_info(*_):
+    pass
+
+
+builtins.ptr8 = lambda buf: memoryview(buf).cast("B")
+builtins.ptr16 = lambda buf: memoryview(buf).cast("B").cast("H")
+builtins.ptr32 = lambda buf: memoryview(buf).cast("B").cast("I")
@@ -0,0 +1,108 @@
+# Host stand-in for the PicoGraphics subset used by src/ (PEN_RGB888 only).
+#
+# The object is itself the framebuffer, as on the device: memoryview(graphics)
+# gives 32 bits per pixel, 0x00RRGGBB little-endian. .pixels is a NumPy
+# (height, width) uint32 view of the same memory and .rgb() an RGB copy.
+#
+# Text uses the real font heights and approximate advance widths, but glyphs
+# are deterministic placeholder patterns: output is stable for regression
+# comparisons but not a faithful rendering of the device fonts.
+import numpy
+
+PEN_RGB888 = 8
+
+# font -> (glyph width, glyph height); advance is width + spacing
+FONTS = {"bitmap6": (5, 6), "bitmap8": (5, 8), "bitmap14_outline": (9, 14)}
+
+
+def _glyph(c, w, h):  # Placeholder glyph mask for character c
+    mask = numpy.zeros((h, w), dtype=bool)
+    if c.isspace():
+        return mask
+    seed = (ord(c) * 2654435761) & 0xFFFFFFFF
+    for col in range(w):
+        bits = (seed >> (col * 5 % 27)) | 1
+        for row in range(h):
+            mask[row, col] = bits >> (row % 8) & 1
+    return mask
+
+
+class PicoGraphics(bytearray):
+    def __init__(self, width, height):
+        super().__init__(width * height * 4)
+        self.width = width
+        self.height = height
+        self.pixels = numpy.frombuffer(self, dtype=numpy.uint32).reshape(height, width)
+        self._pen = 0
+        self._font = "bitmap8"
+        self._glyphs = {}
+        self._clip = (0, 0, width, height)  # x0, y0, x1, y1
+
+    def get_bounds(self):
+        return self.width, self.height
+
+    def create_pen(self, r, g, b):
+        return (r & 0xFF) << 16 | (g & 0xFF) << 8 | (b & 0xFF)
+
+    def set_pen(self, pen):
+        self._pen = pen
+
+    def set_font(self, font):
+        if font not in FONTS:
+            raise ValueError("Unknown font: %s" % font)
+        self._font = font
+
+    def set_clip(self, x, y, w, h):
+        self._clip = (max(x, 0), max(y, 0), min(x + w, self.width), min(y + h, self.height))
+
+    def remove_clip(self):
+        self._clip = (0, 0, self.width, self.height)
+
+    def clear(self):
+        cx0, cy0, cx1, cy1 = self._clip
+        self.pixels[cy0:cy1, cx0:cx1] = self._pen
+
+    def pixel(self, x, y):
+        cx0, cy0, cx1, cy1 = self._clip
+        if cx0 <= x < cx1 and cy0 <= y < cy1:
+            self.pixels[y, x] = self._pen
+
+    def rectangle(self, x, y, w, h):
+        cx0, cy0, cx1, cy1 = self._clip
+        x0 = max(x, cx0)
+        y0 = max(y, cy0)
+        self.pixels[y0:max(min(y + h, cy1), 0), x0:max(min(x + w, cx1), 0)] = self._pen
+
+    def measure_text(self, text, scale=2, spacing=1, fixed_width=False):
+        w, _ = FONTS[self._font]
+        longest = max(len(line) for line in text.split("\n"))
+        return longest * (w + spacing) * int(scale)
+
+    def text(self, text, x, y, wordwrap=-1, scale=2, angle=0, spacing=1, fixed_width=False):
+        w, h = FONTS[self._font]
+        scale = int(scale)
+        for row, line in enumerate(text.split("\n")):
+            cx = x
+            cy = y + row * h * scale
+            for c in line:
+                mask = self._glyphs.get((self._font, c))
+                if mask is None:
+                    mask = self._glyphs[(self._font, c)] = _glyph(c, w, h)
+                self._blit(mask.repeat(scale, 0).repeat(scale, 1), cx, cy)
+                cx += (w + spacing) * scale
+
+    def _blit(self, mask, x, y):
+        mh, mw = mask.shape
+        cx0, cy0, cx1, cy1 = self._clip
+        x0 = max(x, cx0)
+        y0 = max(y, cy0)
+        x1 = min(x + mw, cx1)
+        y1 = min(y + mh, cy1)
+        if x0 >= x1 or y0 >= y1:
+            return
+        region = self.pixels[y0:y1, x0:x1]
+        region[mask[y0 - y:y1 - y, x0 - x:x1 - x]] = self._pen
+
+    def rgb(self):  # (height, width, 3) uint8 copy of the framebuffer
+        p = self.pixels
+        return numpy.stack(((p >> 16) & 0xFF, (p >> 8) & 0xFF, p & 0xFF), axis=-1).astype(numpy.uint8)
@@ -0,0 +1,12 @@
+# Host stand-in for src/secrets.py, configured from the environment. A real
+# src/secrets.py takes precedence.
+import os
+
+WIFI_SSID = ""
+WIFI_PASSWORD = ""
+
+MQTT_HOST = os.environ.get("MQTT_HOST", "localhost")
+MQTT_PORT = int(os.environ.get("MQTT_PORT", "1883"))
+MQTT_USERNAME = os.environ.get("MQTT_USER", "")
+MQTT_PASSWORD = os.environ.get("MQTT_PASSWORD", "")
+MQTT_CLIENT_ID = os.environ.get("MQTT_CLIENT_ID", "ledclient-sim")
@@ -0,0 +1,31 @@
+# Host stand-in for uasyncio on top of asyncio. Tasks created before the event
+# loop runs (allowed by uasyncio) are started by run().
+import asyncio
+from asyncio import *  # noqa: F401,F403
+
+_pending = []
+
+
+def create_task(coro):
+    try:
+        return asyncio.get_running_loop().create_task(coro)
+    except RuntimeError:
+        _pending.append(coro)
+        return None
+
+
+def run(main):
+    async def start():
+        while _pending:
+            asyncio.get_running_loop().create_task(_pending.pop(0))
+        return await main
+
+    return asyncio.run(start())
+
+
+def sleep_ms(ms):
+    return asyncio.sleep(ms / 1000)
+
+
+def wait_for_ms(aw, timeout):
+    return asyncio.wait_for(aw, timeout / 1000)
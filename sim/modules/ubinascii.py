@@ -0,0 +1,2 @@
+# Host stand-in for ubinascii.
+from binascii import *  # noqa: F401,F403
@@ -0,0 +1,2 @@
+# Host stand-in for uerrno.
+from errno import *  # noqa: F401,F403
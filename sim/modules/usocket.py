@@ -0,0 +1,40 @@
+# Host stand-in for usocket: MicroPython stream methods (read, readinto,
+# write) over a CPython socket. As on the device, a non-blocking read with no
+# data returns None.
+import socket as _socket
+from socket import AF_INET, SOCK_STREAM, SOCK_DGRAM, getaddrinfo  # noqa: F401
+
+
+class socket:
+    def __init__(self, af=AF_INET, kind=SOCK_STREAM):
+        self._s = _socket.socket(af, kind)
+
+    def setblocking(self, flag):
+        self._s.setblocking(flag)
+
+    def connect(self, addr):
+        self._s.connect(addr)
+
+    def read(self, n=-1):
+        try:
+            return self._s.recv(n if n > 0 else 4096)
+        except BlockingIOError:
+            return None
+
+    def readinto(self, buf, n=-1):
+        try:
+            return self._s.recv_into(buf, n if n > 0 else 0)
+        except BlockingIOError:
+            return None
+
+    def write(self, buf, n=-1):
+        try:
+            return self._s.send(buf if n < 0 else memoryview(buf)[:n])
+        except BlockingIOError:
+            return None
+
+    def close(self):
+        self._s.close()
+
+    def fileno(self):
+        return self._s.fileno()
@@ -0,0 +1,2 @@
+# Host stand-in for ustruct.
+from struct import *  # noqa: F401,F403
@@ -0,0 +1,30 @@
+# Host stand-in for utime, also installed onto the time module by the
+# simulator so code using time.ticks_ms() runs unchanged.
+import time
+from time import sleep, time as _time  # noqa: F401
+
+_t0 = time.monotonic_ns()
+
+
+def ticks_ms():
+    return (time.monotonic_ns() - _t0) // 1000000
+
+
+def ticks_us():
+    return (time.monotonic_ns() - _t0) // 1000
+
+
+def ticks_diff(a, b):
+    return a - b
+
+
+def ticks_add(a, b):
+    return a + b
+
+
+def sleep_ms(ms):
+    time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    time.sleep(us / 1000000)
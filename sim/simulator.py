@@ -0,0 +1,118 @@
+# Host (CPython) simulator for the LED client.
+#
+# install() puts src/ and the stand-in modules in sim/modules/ (interstate75,
+# picographics over NumPy, machine, network, uasyncio, ...) on sys.path, so
+# device code imports unchanged. Simulator drives the message -> pixels path
+# offline:
+#
+#     sim = Simulator()
+#     sim.publish(b"display text 8 4 0 0 color_fg=#ffff00 Hello")
+#     sim.flush()
+#     sim.save("out.ppm")
+#
+# Command line:
+#
+#     python3 sim/simulator.py render [payloads] [out.ppm]
+#         Render payloads (text commands; a blank line separates messages),
+#         then write the final frame as PPM and print timing.
+#     python3 sim/simulator.py run
+#         Run src/main.py against the broker given by MQTT_HOST/MQTT_PORT.
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+MODULES = os.path.join(ROOT, "sim", "modules")
+
+
+def install():
+    if SRC in sys.path:
+        return
+    # src/ first so a real src/secrets.py wins over the stand-in
+    sys.path.insert(0, MODULES)
+    sys.path.insert(0, SRC)
+    import utime
+
+    for name in ("ticks_ms", "ticks_us", "ticks_diff", "ticks_add", "sleep_ms", "sleep_us"):
+        setattr(time, name, getattr(utime, name))
+    import micropython  # noqa: F401  Provides viper pointer builtins
+
+    if not hasattr(gc, "mem_free"):  # MicroPython heap stats, approximated
+        gc.mem_alloc = lambda: tracemalloc.get_traced_memory()[0]
+        gc.mem_free = lambda: 0
+
+
+class Simulator:
+    def __init__(self, width=128, height=128, fps=30):
+        install()
+        from interstate75 import Interstate75
+        from command import CommandPool
+        from dispatch import Dispatcher
+        from layers import Compositor
+        from renderer import Renderer
+
+        self.i75 = Interstate75(display=(width, height))
+        self.graphics = self.i75.display
+        self.renderer = Renderer(self.i75, fps)
+        self.dispatcher = Dispatcher(
+            self.renderer, layers=Compositor(self.renderer), pool=CommandPool()
+        )
+
+    # Deliver a payload as if received on topic, through the same callback
+    # the MQTT client uses.
+    def publish(self, payload, topic=b"i75/sim", retained=False):
+        if isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.dispatcher.on_message(memoryview(topic), memoryview(payload), retained)
+
+    def flush(self):  # As the render task does once per frame tick
+        return self.renderer.flush()
+
+    @property
+    def updates(self):
+        return self.i75.updates
+
+    def image(self):  # (height, width, 3) uint8 NumPy array
+        return self.graphics.rgb()
+
+    def save(self, path):  # Binary PPM, viewable without extra packages
+        img = self.image()
+        with open(path, "wb") as f:
+            f.write(b"P6 %d %d 255\n" % (img.shape[1], img.shape[0]))
+            f.write(img.tobytes())
+
+
+def _render(args):
+    source = open(args[0]) if args else sys.stdin
+    out = args[1] if len(args) > 1 else "sim.ppm"
+    messages = [m for m in source.read().split("\n\n") if m.strip()]
+    sim = Simulator()
+    t = time.perf_counter()
+    for msg in messages:
+        sim.publish(msg)
+        sim.flush()
+    dt = time.perf_counter() - t
+    sim.save(out)
+    print("%d messages, %d panel updates, %.3f ms/message -> %s" % (
+        len(messages), sim.updates, 1000 * dt / max(len(messages), 1), out))
+
+
+def _run():
+    install()
+    import runpy
+
+    runpy.run_path(os.path.join(SRC, "main.py"), run_name="__main__")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "render":
+        _render(sys.argv[2:])
+    elif cmd == "run":
+        _run()
+    else:
+        print("usage: python3 sim/simulator.py render [payloads] [out.ppm] | run")
+        sys.exit(2)
@@ -0,0 +1,192 @@
+import time
+
+from command import (
+    Command, OP_RECT, OP_TEXT, NO_COLOR, VALIGN_MASK, VALIGN_MIDDLE,
+    ANIM_MARQUEE, ANIM_VMARQUEE, ANIM_BLINK, ANIM_TWEEN, ANIM_STOP,
+)
+
+# Animations run on the device (see "animate" in PROTOCOL.md).
+#
+# An `animate` command starts an effect on a viewport rect. The Renderer calls
+# .tick() once per frame, before pushing the panel, and each running effect
+# redraws its viewport only when its step (scroll offset, blink phase, fade
+# colour, tween position) changes. Effects live in a fixed pool of
+# Animations, each holding a copy of its command and a few ints, so a running
+# animation allocates nothing per frame.
+
+
+class Animation:
+    __slots__ = (
+        "cmd", "ox", "oy", "active", "start", "step", "size", "px", "py", "ex", "ey", "ew", "eh"
+    )
+
+    def __init__(self):
+        self.cmd = Command()
+        self.ox = self.oy = 0  # Origin the command was drawn with
+        self.active = False
+        self.start = 0  # ticks_ms when started
+        self.step = -1  # Last drawn step; -1 forces a redraw
+        self.size = 0  # Text extent along the marquee direction
+        self.px = self.py = 0  # Tween: last drawn position
+        self.ex = self.ey = self.ew = self.eh = 0  # Tween: area drawn, from px, py
+
+
+def _mix(a, b, t):  # Blend 0xRRGGBB colours, t in 0..256
+    r = ((a >> 16) * (256 - t) + (b >> 16) * t) >> 8
+    g = ((a >> 8 & 0xFF) * (256 - t) + (b >> 8 & 0xFF) * t) >> 8
+    bl = ((a & 0xFF) * (256 - t) + (b & 0xFF) * t) >> 8
+    return r << 16 | g << 8 | bl
+
+
+class Animator:
+    def __init__(self, renderer, size=8):
+        self.renderer = renderer
+        self._pool = [Animation() for _ in range(size)]
+        self._item = Command()  # What an effect draws in its current step
+
+    # Start cmd (OP_ANIMATE) drawn with origin ox, oy. An animation already
+    # at the same place is replaced, or kept running if it is the same effect.
+    # Returns False if the pool is full or the viewport is empty.
+    def start(self, cmd, ox, oy):
+        if cmd.fmt != ANIM_STOP and cmd.fmt != ANIM_TWEEN and (cmd.w <= 0 or cmd.h <= 0):
+            print("Error: Animation needs a viewport.")  # Marquees scroll across it
+            return False
+        x = cmd.x + ox
+        y = cmd.y + oy
+        free = None
+        for a in self._pool:
+            if a.active and a.cmd.x + a.ox == x and a.cmd.y + a.oy == y:
+                if cmd.fmt == ANIM_STOP:
+                    a.active = False
+                    return True
+                if a.ox == ox and a.oy == oy and a.cmd.equals(cmd):
+                    a.step = -1  # Keep its phase, but repaint
+                    return True
+                free = a
+                break
+            if free is None and not a.active:
+                free = a
+        if cmd.fmt == ANIM_STOP:
+            return False
+        if free is None:
+            print("Error: Too many animations.")
+            return False
+        a = free
+        a.cmd.copy(cmd)
+        a.cmd.period = max(cmd.period, 1)
+        a.ox = ox
+        a.oy = oy
+        a.start = time.ticks_ms()
+        a.step = -1
+        a.px = x
+        a.py = y
+        a.size = 0
+        a.ex = a.ey = 0
+        a.ew = cmd.w
+        a.eh = cmd.h
+        if cmd.content:
+            r = self.renderer
+            if cmd.font is not None and cmd.font != r.font:
+                r.graphics.set_font(cmd.font)
+                r.font = cmd.font
+            if cmd.fmt == ANIM_TWEEN:
+                self._extent(a, cmd)
+            elif cmd.fmt == ANIM_VMARQUEE:
+                a.size = r.text_height(cmd.content, cmd.scale)
+            else:
+                a.size = r.graphics.measure_text(cmd.content, cmd.scale)
+        a.active = True
+        return True
+
+    # What a tween erases at each step: the rect and all of the text laid out
+    # in it, which may overflow the rect (or the rect may be empty).
+    def _extent(self, a, cmd):
+        lay = self.renderer.layouts.get(cmd.content, cmd.scale, cmd.w, cmd.flow)
+        o = 0 if cmd.color_outline == NO_COLOR else cmd.outline
+        ty = 0
+        if cmd.h > 0 and cmd.flow & VALIGN_MASK:
+            ty = (cmd.h - lay.height) // (2 if cmd.flow & VALIGN_MIDDLE else 1)
+        a.ex = min(0, lay.left - o)
+        a.ey = min(0, ty - o)
+        a.ew = max(cmd.w, lay.right + o) - a.ex
+        a.eh = max(cmd.h, ty + lay.height + o) - a.ey
+
+    def stop_all(self):
+        for a in self._pool:
+            a.active = False
+
+    def tick(self):
+        now = time.ticks_ms()
+        for a in self._pool:
+            if a.active:
+                self._step(a, time.ticks_diff(now, a.start))
+
+    def _step(self, a, t):
+        cmd = a.cmd
+        r = self.renderer
+        period = cmd.period
+        effect = cmd.fmt
+        vx = cmd.x + a.ox  # Viewport
+        vy = cmd.y + a.oy
+        w = cmd.w
+        h = cmd.h
+        item = self._item
+        item.op = OP_TEXT if cmd.content else OP_RECT
+        item.x = vx
+        item.y = vy
+        item.w = w
+        item.h = cmd.h
+        item.fg = cmd.fg
+        item.scale = cmd.scale
+        item.font = cmd.font
+        item.content = cmd.content
+        # Scrolling text is laid out unaligned, as wide as it is
+        item.flow = 0 if effect == ANIM_MARQUEE or effect == ANIM_VMARQUEE else cmd.flow
+        item.outline = cmd.outline
+        item.color_outline = cmd.color_outline
+        bg = 0x000000 if cmd.bg == NO_COLOR else cmd.bg
+
+        if effect == ANIM_TWEEN:
+            k = 256 if t >= period else t * 256 // period
+            x = vx + cmd.dx * k // 256
+            y = vy + cmd.dy * k // 256
+            step = (x & 0x3FF) << 10 | (y & 0x3FF)  # Small int
+            if step == a.step:
+                return
+            if a.step >= 0:
+                r.fill(a.px + a.ex, a.py + a.ey, a.ew, a.eh, bg)
+            a.step = step
+            a.px = item.x = x
+            a.py = item.y = y
+            r.draw(item)
+            if k == 256:
+                a.active = False  # Stays at the end position
+            return
+
+        if effect == ANIM_MARQUEE:
+            step = t // period % (w + a.size)
+            item.x = vx + w - step
+        elif effect == ANIM_VMARQUEE:
+            step = t // period % (h + a.size)
+            item.y = vy + h - step
+        elif effect == ANIM_BLINK:
+            step = t * 2 // period & 1
+        else:  # ANIM_FADE: fg to color_to and back
+            k = t % period * 512 // period
+            if k > 256:
+                k = 512 - k
+            fg = 0xFFFFFF if cmd.fg == NO_COLOR else cmd.fg
+            to = fg if cmd.color_to == NO_COLOR else cmd.color_to
+            step = item.fg = _mix(fg, to, k)
+        if step == a.step:
+            return
+        a.step = step
+        r.fill(vx, vy, w, h, bg)
+        if effect == ANIM_BLINK and step:
+            return  # Off phase
+        if item.op == OP_RECT:  # Rects fill the viewport
+            item.x = vx
+            item.y = vy
+        r.clip(vx, vy, w, h)
+        r.draw(item)
+        r.clip()
@@ -0,0 +1,197 @@
+import struct
+
+from command import (
+    Command, OP_CLEAR, OP_RECT, OP_TEXT, OP_FRAME, OP_LAYER, OP_DEFINE, OP_CALL, OP_ANIMATE,
+    OP_WIDGET, OP_SET, OP_ADD, OP_SPRITE, OP_BLIT, NO_COLOR,
+)
+from pens import PALETTE_INDEX
+
+# Binary encoding of the display commands (see "Binary encoding" in
+# PROTOCOL.md). Decodes into the same Command records as the text parser.
+
+MAGIC = 0xD5  # First payload byte; never starts a text command
+VERSION = 2  # Version 1 payloads, without the layout fields, are accepted
+
+OP_MASK = 0x0F
+F_FG = 0x10  # Foreground colour follows
+F_BG = 0x20  # Background colour follows
+F_INDEXED = 0x40  # Colours are 1 byte palette indices instead of RGB565
+F_FONT = 0x80  # Font name (text, animate, widget) or layer name (layer) follows
+
+
+def rgb565_to_rgb(c):
+    r = c >> 11
+    g = (c >> 5) & 0x3F
+    b = c & 0x1F
+    return (r << 3 | r >> 2) << 16 | (g << 2 | g >> 4) << 8 | (b << 3 | b >> 2)
+
+
+def rgb_to_rgb565(rgb):
+    return (rgb >> 8 & 0xF800) | (rgb >> 5 & 0x07E0) | (rgb >> 3 & 0x001F)
+
+
+def _color(buf, i, flags):  # Returns 0xRRGGBB
+    if flags & F_INDEXED:
+        return PALETTE_INDEX[buf[i]]
+    return rgb565_to_rgb(buf[i] | buf[i + 1] << 8)
+
+
+def _text(buf, i, j, pool):
+    if pool is None:
+        return str(buf[i:j], "utf-8")
+    return pool.text(buf, i, j)
+
+
+def _i16(buf, i):  # Little endian, signed; unlike struct, allocates no tuple
+    v = buf[i] | buf[i + 1] << 8
+    return v - 0x10000 if v & 0x8000 else v
+
+
+# Decode a binary payload, buf[:end] (bytes, bytearray or memoryview), into a
+# list of Commands, or return None after printing an error. With a
+# CommandPool, records and strings come from it and the list is pool.batch,
+# as for parse_batch.
+def parse_binary(buf, pool=None, end=None):
+    n = len(buf) if end is None else end
+    if n < 2 or buf[0] != MAGIC:
+        print("Error: Not a binary payload.")
+        return None
+    version = buf[1]
+    if version != 1 and version != VERSION:
+        print("Error: Unsupported binary protocol version", version)
+        return None
+    if pool is None:
+        commands = []
+    else:
+        commands = pool.batch
+        commands.clear()
+    i = 2
+    try:
+        while i < n:
+            flags = buf[i]
+            op = flags & OP_MASK
+            i += 1
+            cmd = Command() if pool is None else pool.take()
+            cmd.reset(op)
+            if op == OP_FRAME:
+                if i + 14 > n:
+                    raise ValueError("Truncated command")
+                cmd.x, cmd.y, cmd.w, cmd.h, fmt, enc, k = struct.unpack_from(
+                    "<hhhhBBI", buf, i)
+                i += 14
+                if i + k > n:
+                    raise ValueError("Truncated frame data")
+                cmd.fmt = fmt << 4 | enc
+                cmd.data = buf[i:i + k]  # A view, not a copy, if buf is a memoryview
+                i += k
+            elif op == OP_SPRITE:
+                if i + 20 > n:
+                    raise ValueError("Truncated command")
+                cmd.sprite, cmd.w, cmd.h, fmt, enc, cmd.size, cmd.offset, k = \
+                    struct.unpack_from("<HhhBBIII", buf, i)
+                i += 20
+                if i + k > n:
+                    raise ValueError("Truncated sprite data")
+                cmd.fmt = fmt << 4 | enc
+                cmd.data = buf[i:i + k]
+                i += k
+            elif op == OP_BLIT:
+                if i + 6 > n:
+                    raise ValueError("Truncated command")
+                cmd.sprite, cmd.x, cmd.y = struct.unpack_from("<Hhh", buf, i)
+                i += 6
+            elif op == OP_LAYER:
+                if i + 9 > n:
+                    raise ValueError("Truncated command")
+                cmd.x, cmd.y, cmd.w, cmd.h, cmd.z = struct.unpack_from("<hhhhb", buf, i)
+                i += 9
+                if flags & F_FONT:
+                    k = buf[i]
+                    if i + 1 + k > n:
+                        raise ValueError("Truncated name")
+                    cmd.layer = str(buf[i + 1:i + 1 + k], "utf-8")
+                    i += 1 + k
+            elif op == OP_DEFINE or op == OP_CALL:
+                if op == OP_CALL:
+                    if i + 4 > n:
+                        raise ValueError("Truncated command")
+                    cmd.x, cmd.y = struct.unpack_from("<hh", buf, i)
+                    i += 4
+                k = buf[i]
+                if i + 1 + k > n:
+                    raise ValueError("Truncated name")
+                cmd.content = _text(buf, i + 1, i + 1 + k, pool)
+                i += 1 + k
+            elif op == OP_SET or op == OP_ADD:
+                k = buf[i]
+                if i + 1 + k > n:
+                    raise ValueError("Truncated name")
+                cmd.name = _text(buf, i + 1, i + 1 + k, pool)
+                i += 1 + k
+                if op == OP_ADD:
+                    if i + 4 > n:
+                        raise ValueError("Truncated command")
+                    cmd.x = struct.unpack_from("<i", buf, i)[0]
+                    i += 4
+                else:
+                    k = buf[i] | buf[i + 1] << 8
+                    i += 2
+                    if i + k > n:
+                        raise ValueError("Truncated content")
+                    cmd.content = str(buf[i:i + k], "utf-8")
+                    i += k
+            elif op != OP_CLEAR:
+                if op != OP_RECT and op != OP_TEXT and op != OP_ANIMATE and op != OP_WIDGET:
+                    raise ValueError("Unknown opcode %d" % op)
+                if i + 8 > n:
+                    raise ValueError("Truncated command")
+                cmd.x = _i16(buf, i)
+                cmd.y = _i16(buf, i + 2)
+                cmd.w = _i16(buf, i + 4)
+                cmd.h = _i16(buf, i + 6)
+                i += 8
+                k = 1 if flags & F_INDEXED else 2  # Colour size
+                if flags & F_FG:
+                    cmd.fg = _color(buf, i, flags)
+                    i += k
+                if flags & F_BG:
+                    cmd.bg = _color(buf, i, flags)
+                    i += k
+                if version > 1:
+                    cmd.flow = buf[i]
+                    cmd.outline = buf[i + 1]
+                    i += 2
+                    if cmd.outline:
+                        cmd.color_outline = _color(buf, i, flags)
+                        i += k
+                if op != OP_RECT:
+                    cmd.scale = buf[i]
+                    i += 1
+                    if flags & F_FONT:
+                        k = buf[i]
+                        if i + 1 + k > n:
+                            raise ValueError("Truncated name")
+                        cmd.font = str(buf[i + 1:i + 1 + k], "utf-8")
+                        i += 1 + k
+                    k = buf[i] | buf[i + 1] << 8
+                    i += 2
+                    if i + k > n:
+                        raise ValueError("Truncated content")
+                    cmd.content = _text(buf, i, i + k, pool)
+                    i += k
+                if op == OP_ANIMATE:
+                    if i + 11 > n:
+                        raise ValueError("Truncated command")
+                    cmd.fmt, cmd.period, cmd.dx, cmd.dy, c = struct.unpack_from(
+                        "<BHhhI", buf, i)
+                    cmd.color_to = NO_COLOR if c == 0xFFFFFFFF else c
+                    i += 11
+            if i > n:
+                raise ValueError("Truncated command")
+            commands.append(cmd)
+    except (ValueError, IndexError) as e:
+        print("Error: Invalid binary payload:", e)
+        if pool is not None:
+            pool.release(commands)
+        return None
+    return commands
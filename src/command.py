@@ -0,0 +1,604 @@
+from binascii import a2b_base64
+
+from pens import PALETTE
+from scan import (
+    equals as _equals, find as _find, same as _same, skip_space as _skip_space,
+    token_end as _token_end, token_start as _token_start, trim_end as _trim_end,
+)
+
+# Allocation-light parser for the text protocol (see PROTOCOL.md).
+#
+# Works directly on the received bytes in a single pass and fills a
+# fixed-slot Command record instead of building token lists and nested dicts.
+# Parsing a `text` command allocates the record and the decoded content
+# string; with a CommandPool both are reused, so a steady stream of
+# clear/rect/text messages parses without allocating.
+#
+# Commands are found in a registry by namespace and name, in constant time,
+# and their arguments parsed by the schema they were registered with (see
+# register()), so other namespaces can be added without touching the parser.
+
+# Animation effects (Command.fmt of OP_ANIMATE)
+ANIM_MARQUEE = 0
+ANIM_VMARQUEE = 1
+ANIM_BLINK = 2
+ANIM_FADE = 3
+ANIM_TWEEN = 4
+ANIM_STOP = 5
+
+# Text layout (Command.flow)
+ALIGN_CENTER = 1
+ALIGN_RIGHT = 2
+ALIGN_MASK = 3
+VALIGN_MIDDLE = 4
+VALIGN_BOTTOM = 8
+VALIGN_MASK = 12
+WRAP = 16
+
+# (name, glyph height) by font_num
+FONTS = (("bitmap8", 8), ("bitmap6", 6), ("bitmap14_outline", 14))
+
+NO_COLOR = -1  # Colour slot not set; colours are held as 0xRRGGBB
+
+_EFFECTS = (
+    (b"marquee", ANIM_MARQUEE), (b"vmarquee", ANIM_VMARQUEE), (b"blink", ANIM_BLINK),
+    (b"fade", ANIM_FADE), (b"tween", ANIM_TWEEN), (b"stop", ANIM_STOP)
+)
+
+
+class Command:
+    __slots__ = (
+        "op", "x", "y", "w", "h", "fg", "bg", "scale", "font", "content", "fmt", "data",
+        "z", "layer", "period", "dx", "dy", "color_to", "name", "flow", "outline",
+        "color_outline", "sprite", "offset", "size"
+    )
+
+    def __init__(self):
+        self.reset(OP_CLEAR)
+
+    def reset(self, op):
+        self.op = op
+        self.x = 0
+        self.y = 0
+        self.w = 0
+        self.h = 0
+        self.fg = NO_COLOR
+        self.bg = NO_COLOR
+        self.scale = 1
+        self.font = None
+        self.content = None  # OP_TEXT, OP_ANIMATE: text; OP_WIDGET: template;
+        # OP_DEFINE, OP_CALL: list name; OP_SET: value
+        self.fmt = 0  # OP_FRAME, OP_SPRITE: pixel format << 4 | encoding;
+        # OP_ANIMATE: effect
+        self.data = None  # OP_FRAME, OP_SPRITE: pixel data
+        self.z = 0  # OP_LAYER: stacking order, higher is on top
+        self.layer = None  # OP_LAYER: layer name, instead of the topic
+        self.period = 1000  # OP_ANIMATE: cycle in ms (marquee: ms per pixel)
+        self.dx = 0  # OP_ANIMATE: tween distance
+        self.dy = 0
+        self.color_to = NO_COLOR  # OP_ANIMATE: fade colour
+        self.name = None  # OP_SET, OP_ADD: variable name (OP_ADD: amount in x)
+        self.flow = 0  # Text: ALIGN_*, VALIGN_* and WRAP flags
+        self.outline = 0  # Outline width in pixels
+        self.color_outline = NO_COLOR
+        self.sprite = 0  # OP_SPRITE, OP_BLIT: sprite id
+        self.offset = 0  # OP_SPRITE: where this chunk goes in the sprite data
+        self.size = 0  # OP_SPRITE: sprite data length
+
+    def copy(self, other):  # Make this a copy of other
+        for name in self.__slots__:
+            setattr(self, name, getattr(other, name))
+
+    def equals(self, other):
+        for name in self.__slots__:
+            if name != "data" and getattr(self, name) != getattr(other, name):
+                return False
+        if self.data is None or other.data is None:
+            return self.data is other.data
+        return bytes(self.data) == bytes(other.data)
+
+
+# Command records and strings for parse_batch and parse_binary to reuse.
+#
+# Records come from a free list and are given back with .release() once a
+# batch has been drawn. When the list is empty new records are allocated;
+# records something keeps (display lists, layers) are just never released.
+# Content strings are looked up among the last ones decoded, by their bytes,
+# so repeated text allocates nothing and compares by identity in the
+# renderer's caches.
+class CommandPool:
+    def __init__(self, size=16, strings=16):
+        self._free = [Command() for _ in range(size)]
+        self._n = size  # Free records are _free[:_n]
+        self._raw = [b""] * strings  # Recent strings as received, oldest at _next
+        self._strs = [""] * strings
+        self._next = 0
+        self.batch = []  # Returned by parse_batch and parse_binary, reused
+
+    def take(self):  # A record, to reset
+        if not self._n:
+            return Command()
+        self._n -= 1
+        return self._free[self._n]
+
+    def release(self, commands):  # Give back records nothing refers to
+        free = self._free
+        for cmd in commands:
+            if self._n == len(free):
+                return  # Full: the rest are collected
+            cmd.data = None  # May be a view of the payload
+            free[self._n] = cmd
+            self._n += 1
+
+    def text(self, buf, i, j):  # str(buf[i:j], "utf-8"), reusing a recent one
+        raw = self._raw
+        for k in range(len(raw)):
+            if _same(buf, i, j, raw[k]):
+                return self._strs[k]
+        b = bytes(buf[i:j])
+        s = str(b, "utf-8")
+        k = self._next
+        raw[k] = b
+        self._strs[k] = s
+        self._next = (k + 1) % len(raw)
+        return s
+
+
+def _text(buf, i, j, pool):
+    if pool is None:
+        return str(buf[i:j], "utf-8")
+    return pool.text(buf, i, j)
+
+
+def _int(buf, i, j):
+    neg = i < j and buf[i] == 45  # '-'
+    if neg:
+        i += 1
+    if i >= j:
+        raise ValueError("Expected an integer")
+    v = 0
+    while i < j:
+        c = buf[i] - 48
+        if not 0 <= c <= 9:
+            raise ValueError("Expected an integer")
+        v = v * 10 + c
+        i += 1
+    return -v if neg else v
+
+
+def _color(buf, i, j):  # '#rrggbb', 'rrggbb' or palette name to 0xRRGGBB
+    k = i
+    if k < j and buf[k] == 35:  # '#'
+        k += 1
+    v = 0
+    if j - k == 6:
+        while k < j:
+            c = buf[k]
+            if 48 <= c <= 57:
+                c -= 48
+            elif 97 <= c <= 102:
+                c -= 87
+            elif 65 <= c <= 70:
+                c -= 55
+            else:
+                break
+            v = v << 4 | c
+            k += 1
+        else:
+            return v
+    v = PALETTE.get(str(buf[i:j], "utf-8"))
+    if v is None:
+        raise ValueError("Invalid color: expected #rrggbb or a palette name.")
+    return v
+
+
+_ALIGN = ((b"left", 0), (b"center", ALIGN_CENTER), (b"right", ALIGN_RIGHT))
+_VALIGN = ((b"top", 0), (b"middle", VALIGN_MIDDLE), (b"bottom", VALIGN_BOTTOM))
+_WRAP = ((b"false", 0), (b"true", WRAP))
+_FORMATS = ((b"rgb565", 0 << 4), (b"rgb888", 1 << 4), (b"indexed", 2 << 4))  # frame.FMT_* << 4
+_ENCODINGS = ((b"raw", 0), (b"rle", 1))  # frame.ENC_*
+
+
+_FONT_NAMES = tuple((name.encode(), name) for name, _ in FONTS)
+
+
+def _keyword(buf, i, j, words):  # Value of the (word, value) pair matching buf[i:j]
+    for word, value in words:
+        if _equals(buf, i, j, word):
+            return value
+    raise ValueError("Invalid value: " + str(buf[i:j], "utf-8"))
+
+
+# Style value kinds
+V_INT = 0
+V_COLOR = 1  # '#rrggbb', 'rrggbb' or palette name
+V_TEXT = 2
+V_BITS = 3  # Keyword, a (word, value) table, into the bits mask of the slot
+V_FONT = 4  # Font name
+V_FONT_NUM = 5  # Index in FONTS
+V_FONT_SIZE = 6  # Glyph height in FONTS
+V_SPEED = 7  # Pixels per second, into a period in ms per pixel
+
+# Style keys: (key, kind, slot) or, for V_BITS, (key, kind, slot, table, mask).
+# A command's schema lists the ones it takes (see register()).
+S_COLOR_FG = (b"color_fg", V_COLOR, "fg")
+S_COLOR_BG = (b"color_bg", V_COLOR, "bg")
+S_OUTLINE = (b"outline", V_INT, "outline")
+S_COLOR_OUTLINE = (b"color_outline", V_COLOR, "color_outline")
+S_SCALE = (b"scale", V_INT, "scale")
+S_FONT = (b"font", V_FONT, "font")
+S_FONT_NUM = (b"font_num", V_FONT_NUM, "font")
+S_FONT_SIZE = (b"font_size", V_FONT_SIZE, "font")
+S_ALIGN = (b"align", V_BITS, "flow", _ALIGN, ALIGN_MASK)
+S_VALIGN = (b"valign", V_BITS, "flow", _VALIGN, VALIGN_MASK)
+S_WRAP = (b"wrap", V_BITS, "flow", _WRAP, WRAP)
+S_Z = (b"z", V_INT, "z")
+S_LAYER = (b"layer", V_TEXT, "layer")
+S_PERIOD = (b"period", V_INT, "period")
+S_SPEED = (b"speed", V_SPEED, "period")
+S_DX = (b"dx", V_INT, "dx")
+S_DY = (b"dy", V_INT, "dy")
+S_COLOR_TO = (b"color_to", V_COLOR, "color_to")
+S_FORMAT = (b"format", V_BITS, "fmt", _FORMATS, 0xF0)
+S_ENCODING = (b"encoding", V_BITS, "fmt", _ENCODINGS, 0x0F)
+S_OFFSET = (b"offset", V_INT, "offset")
+S_SIZE = (b"size", V_INT, "size")
+
+
+def _set_style(cmd, buf, i, eq, j, styles):  # Apply key buf[i:eq] = value buf[eq+1:j]
+    style = _lookup(styles, buf, i, eq)
+    if style is None:
+        raise ValueError("Unknown style '%s'." % str(buf[i:eq], "utf-8"))
+    kind = style[1]
+    v = eq + 1
+    if kind == V_INT:
+        value = _int(buf, v, j)
+    elif kind == V_COLOR:
+        value = _color(buf, v, j)
+    elif kind == V_BITS:
+        value = getattr(cmd, style[2]) & ~style[4] | _keyword(buf, v, j, style[3])
+    elif kind == V_TEXT:
+        value = str(buf[v:j], "utf-8")
+    elif kind == V_FONT:
+        for name, value in _FONT_NAMES:
+            if _equals(buf, v, j, name):
+                break  # Built in: no string to allocate
+        else:
+            value = str(buf[v:j], "utf-8")
+    elif kind == V_FONT_NUM:
+        n = _int(buf, v, j)
+        if not 0 <= n < len(FONTS):
+            raise ValueError("Invalid font_num")
+        value = FONTS[n][0]
+    elif kind == V_FONT_SIZE:
+        n = _int(buf, v, j)
+        for value, height in FONTS:
+            if height == n:
+                break
+        else:
+            raise ValueError("Invalid font_size")
+    else:  # V_SPEED
+        value = 1000 // max(_int(buf, v, j), 1)
+    setattr(cmd, style[2], value)
+
+
+def _set_styles(cmd, buf, i, j, styles):  # Apply a token of comma separated key=value pairs
+    while i < j:
+        comma = _find(buf, b",", i, j)
+        eq = _find(buf, b"=", i, comma)
+        if eq == comma:
+            if i < comma:
+                raise ValueError("Expected key=value")
+        else:
+            _set_style(cmd, buf, i, eq, comma, styles)
+        i = comma + 1
+
+
+def _key(buf, i, j):  # Hash of a token for registry lookups, case insensitive, without slicing
+    if i == j:
+        return 0
+    return (j - i) << 16 | (buf[i] | 32) << 8 | (buf[j - 1] | 32)
+
+
+def _lookup(table, buf, i, j):  # Registry entry named buf[i:j], or None
+    entries = table.get(_key(buf, i, j))
+    if entries is not None:
+        for entry in entries:
+            if _equals(buf, i, j, entry[0]):
+                return entry
+    return None
+
+
+# Argument kinds for command schemas (see register())
+A_INT = 0
+A_NAME = 1
+A_KEYWORD = 2
+A_STYLE = 3
+A_REST = 4
+A_DATA = 5
+A_OPTIONAL = 6
+_STYLE_CONTENT = 7  # A_STYLE compiled for what follows it
+_STYLE_DATA = 8
+
+_NAMESPACES = {}  # _key -> [(namespace, {_key -> [(name, CommandType)]})]
+COMMANDS = []  # CommandType by op
+
+
+# A registered command: how it is parsed from text, and what handles it.
+class CommandType:
+    __slots__ = ("name", "op", "steps", "draw", "receive")
+
+    def __init__(self, name, op, steps, draw, receive):
+        self.name = name
+        self.op = op
+        self.steps = steps
+        self.draw = draw
+        self.receive = receive
+
+
+# Add the command `NAMESPACE NAME` (both lower case bytes) and return its op,
+# allocated here: the next free one, or the same one again if the command is
+# registered anew. Its text arguments are parsed by schema, a tuple of
+# (kind, slot) or (kind, slot, table) in order, of
+#
+#   A_INT       integer token into slot
+#   A_NAME      token, as str, into slot
+#   A_KEYWORD   token, one of the (word, value) pairs in table, value into slot
+#   A_STYLE     key=value tokens (slot None), table the style keys taken (S_*);
+#               others are rejected. Before A_REST up to the first token not
+#               led by one of these keys, before A_DATA up to the last token
+#   A_REST      rest of the line, as str, into slot; last
+#   A_DATA      last token, base64 decoded, into slot; last
+#   A_OPTIONAL  (slot None) the arguments after it may be left out together
+#
+# or None for a command only sent in binary. The schema is compiled into parse
+# steps here, once. Parsed commands are handled by
+#
+#   draw(renderer, cmd, x, y)   draws cmd with the Renderer, at x, y from its
+#       origin; returns False if the command was skipped or invalid
+#   receive(dispatcher, batch, i, msg, end)   takes batch[i], which leads the
+#       message msg[:end] (or follows other such commands), before anything is
+#       drawn; returns the index of the next command to handle
+#
+# or neither, for headers others look for (layer). Ops of the built-in
+# commands are their binary opcodes (4 bits), so those registered later are
+# text only.
+def register(namespace, name, schema, draw=None, receive=None):
+    if schema is None:
+        steps = None
+    else:
+        steps = []
+        n = len(schema)
+        for k in range(n):
+            arg = schema[k]
+            kind = arg[0]
+            table = arg[2] if len(arg) > 2 else None
+            if (kind == A_REST or kind == A_DATA) and k != n - 1:
+                raise ValueError("Argument must come last")
+            if kind == A_STYLE:
+                if table is None:
+                    raise ValueError("Style keys expected")
+                styles = {}
+                for style in table:
+                    styles.setdefault(_key(style[0], 0, len(style[0])), []).append(style)
+                table = styles
+                if k < n - 1:
+                    if schema[k + 1][0] == A_REST:
+                        kind = _STYLE_CONTENT
+                    elif schema[k + 1][0] == A_DATA:
+                        kind = _STYLE_DATA
+            steps.append((kind, arg[1], table))
+        steps = tuple(steps)
+    key = _key(namespace, 0, len(namespace))
+    for ns in _NAMESPACES.get(key, ()):
+        if ns[0] == namespace:
+            commands = ns[1]
+            break
+    else:
+        commands = {}
+        _NAMESPACES.setdefault(key, []).append((namespace, commands))
+    key = _key(name, 0, len(name))
+    entries = commands.get(key, [])
+    for k in range(len(entries)):
+        if entries[k][0] == name:  # Registered anew: keep the op
+            t = entries.pop(k)[1]
+            t.steps = steps
+            t.draw = draw
+            t.receive = receive
+            break
+    else:
+        t = CommandType(name, len(COMMANDS), steps, draw, receive)
+        COMMANDS.append(t)
+    if steps is not None:
+        entries.append((name, t))
+        commands[key] = entries
+    return t.op
+
+
+# Handlers of the built-in commands. Drawing is the Renderer's (renderer.py),
+# which cannot be imported here.
+
+def _draw_clear(r, cmd, x, y):
+    return r.draw_clear()
+
+
+def _draw_shape(r, cmd, x, y):  # rect, text
+    return r.draw_shape(cmd, x, y)
+
+
+def _draw_frame(r, cmd, x, y):
+    return r.draw_frame(cmd, x, y)
+
+
+def _draw_call(r, cmd, x, y):
+    return r.draw_call(cmd, x, y)
+
+
+def _draw_animate(r, cmd, x, y):
+    return r.anims.start(cmd, r.ox, r.oy)
+
+
+def _draw_widget(r, cmd, x, y):
+    return r.widgets.place(cmd, r.ox, r.oy)
+
+
+def _draw_set(r, cmd, x, y):
+    r.widgets.set(cmd.name, cmd.content)
+    return True
+
+
+def _draw_add(r, cmd, x, y):
+    r.widgets.add(cmd.name, cmd.x)
+    return True
+
+
+def _draw_blit(r, cmd, x, y):
+    return r.draw_blit(cmd, x, y)
+
+
+def _receive_define(d, batch, i, msg, end):  # Store the rest of the batch as a display list
+    if i:
+        print("Error: Command 'define' must come first.")
+    else:
+        name = batch[0].content
+        if d.renderer.lists.define(name, batch[1:], msg[:end]) and d.layers:
+            d.layers.refresh(name)
+    return len(batch)
+
+
+def _receive_sprite(d, batch, i, msg, end):  # Store a sprite chunk
+    d.renderer.sprites.load(batch[i])
+    return i + 1
+
+
+_RECT = ((A_INT, "x"), (A_INT, "y"), (A_INT, "w"), (A_INT, "h"))
+_COLORS = (S_COLOR_FG, S_COLOR_BG, S_OUTLINE, S_COLOR_OUTLINE)
+_TEXT = _COLORS + (S_SCALE, S_FONT, S_FONT_NUM, S_FONT_SIZE, S_ALIGN, S_VALIGN, S_WRAP)
+_CONTENT = (A_REST, "content")
+
+# The built-in commands, in binary opcode order
+OP_CLEAR = register(b"display", b"clear", (), _draw_clear)
+OP_RECT = register(b"display", b"rect", _RECT + ((A_STYLE, None, _COLORS),), _draw_shape)
+OP_TEXT = register(b"display", b"text", _RECT + ((A_STYLE, None, _TEXT), _CONTENT), _draw_shape)
+OP_FRAME = register(b"display", b"frame", None, _draw_frame)  # See frame.py
+OP_LAYER = register(  # Layer header, see layers.py
+    b"display", b"layer", _RECT + ((A_STYLE, None, (S_Z, S_LAYER)),))
+OP_DEFINE = register(  # Display list header, see displaylist.py
+    b"display", b"define", ((A_NAME, "content"),), receive=_receive_define)
+OP_CALL = register(b"display", b"call", (
+    (A_NAME, "content"), (A_OPTIONAL, None), (A_INT, "x"), (A_INT, "y")), _draw_call)
+OP_ANIMATE = register(b"display", b"animate", (  # See animate.py
+    (A_KEYWORD, "fmt", _EFFECTS),) + _RECT + (
+    (A_STYLE, None, _TEXT + (S_PERIOD, S_SPEED, S_DX, S_DY, S_COLOR_TO)), _CONTENT), _draw_animate)
+OP_WIDGET = register(  # See widgets.py
+    b"display", b"widget", _RECT + ((A_STYLE, None, _TEXT), _CONTENT), _draw_widget)
+OP_SET = register(b"display", b"set", ((A_NAME, "name"), _CONTENT), _draw_set)
+OP_ADD = register(b"display", b"add", ((A_NAME, "name"), (A_INT, "x")), _draw_add)
+OP_SPRITE = register(b"display", b"sprite", (  # Upload chunk, see sprites.py
+    (A_INT, "sprite"), (A_INT, "w"), (A_INT, "h"),
+    (A_STYLE, None, (S_FORMAT, S_ENCODING, S_OFFSET, S_SIZE)), (A_DATA, "data")),
+    receive=_receive_sprite)
+OP_BLIT = register(
+    b"display", b"blit", ((A_INT, "sprite"), (A_INT, "x"), (A_INT, "y")), _draw_blit)
+
+
+# Parse one command from buf[start:end] (bytes, bytearray or memoryview). Fills and returns cmd
+# (a new Command, or one from pool, if None), or returns None after printing an error. Strings are
+# decoded through pool if given.
+def parse_command(buf, start=0, end=None, cmd=None, pool=None):
+    if end is None:
+        end = len(buf)
+    end = _trim_end(buf, start, end)  # Trailing whitespace, CR
+    try:
+        i = _skip_space(buf, start, end)
+        j = _token_end(buf, i, end)
+        ns = _lookup(_NAMESPACES, buf, i, j)
+        if ns is None:
+            raise ValueError("Unknown namespace '%s'." % str(buf[i:j], "utf-8"))
+        i = _skip_space(buf, j, end)
+        j = _token_end(buf, i, end)
+        entry = _lookup(ns[1], buf, i, j)
+        if entry is None:
+            raise ValueError("Unknown command '%s' for namespace '%s'." % (
+                str(buf[i:j], "utf-8"), ns[0].decode()))
+        if cmd is None:
+            cmd = Command() if pool is None else pool.take()
+        t = entry[1]
+        cmd.reset(t.op)
+        i = _skip_space(buf, j, end)
+
+        for kind, slot, table in t.steps:
+            if kind == A_OPTIONAL:
+                if i == end:
+                    break
+                continue
+            if kind == A_REST:
+                setattr(cmd, slot, _text(buf, i, end, pool))
+                i = end
+            elif kind == A_DATA:
+                if i == end:
+                    raise ValueError("Expected data")
+                setattr(cmd, slot, a2b_base64(buf[i:end]))
+                i = end
+            elif kind == A_STYLE or kind == _STYLE_CONTENT or kind == _STYLE_DATA:
+                k = end
+                if kind == _STYLE_DATA:  # The data is the last token
+                    k = _token_start(buf, i, end)
+                while i < k:
+                    j = _token_end(buf, i, k)
+                    if kind == _STYLE_CONTENT:  # Content starts at a token not led by a key=
+                        eq = _find(buf, b"=", i, j)
+                        if eq == j or _lookup(table, buf, i, eq) is None:
+                            break
+                    _set_styles(cmd, buf, i, j, table)
+                    i = _skip_space(buf, j, k)
+            else:
+                j = _token_end(buf, i, end)
+                if kind == A_INT:
+                    v = _int(buf, i, j)
+                elif kind == A_NAME:
+                    if i == j:
+                        raise ValueError("Expected a name")
+                    v = _text(buf, i, j, pool)
+                else:
+                    v = _keyword(buf, i, j, table)
+                setattr(cmd, slot, v)
+                i = _skip_space(buf, j, end)
+        if i < end:
+            raise ValueError("Unexpected parameters")
+        return cmd
+    except ValueError as e:
+        print("Error:", e.args[0])
+        return None
+
+
+# Parse a payload holding one command per line (see "Batches" in PROTOCOL.md)
+# from buf[:end] (bytes, bytearray or memoryview, parsed in place). Returns a
+# list of Commands, or None if any line is invalid. With a CommandPool the
+# list is pool.batch, valid until the next parse.
+def parse_batch(buf, pool=None, end=None):
+    if pool is None:
+        commands = []
+    else:
+        commands = pool.batch
+        commands.clear()
+    n = len(buf) if end is None else end
+    i = 0
+    line_num = 1
+    while i < n:
+        j = _find(buf, b"\n", i, n)
+        k = _skip_space(buf, i, j)
+        if k < j and buf[k] != 35:  # Skip blank lines and '#' comments
+            cmd = parse_command(buf, k, j, None, pool)
+            if cmd is None:
+                print("Error: Rejecting batch, invalid command on line", line_num)
+                if pool is not None:
+                    pool.release(commands)
+                return None
+            commands.append(cmd)
+        i = j + 1
+        line_num += 1
+    if not commands:
+        print("Error: Empty message received.")
+        return None
+    return commands
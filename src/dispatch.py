@@ -0,0 +1,99 @@
+import time
+
+from binary import parse_binary, MAGIC
+from command import COMMANDS, parse_batch
+
+
+# Turns MQTT messages into Commands and draws them with the Renderer.
+# With a Metrics instance, counts messages and times parsing and drawing.
+# With an Inbox, messages are queued and drawn when the render task calls
+# .drain(), otherwise they are drawn as they arrive. With a Compositor,
+# messages for layers are composited instead of drawn directly. With a
+# CommandPool, Commands are reused once drawn.
+class Dispatcher:
+    DEBUG = False  # Log every message
+
+    def __init__(self, renderer, metrics=None, inbox=None, layers=None, pool=None):
+        self.renderer = renderer
+        self.metrics = metrics
+        self.inbox = inbox
+        self.layers = layers
+        self.pool = pool
+        self._handler = self.handle  # Bound once: taking it allocates under MicroPython
+
+    # MQTT subscription callback. topic and msg are memoryviews into the MQTT
+    # receive buffer and are only valid until this returns.
+    def on_message(self, topic, msg, retained):
+        if self.DEBUG:
+            print(f'Topic: "{str(topic, "utf-8")}" Message: {len(msg)} bytes Retained: {retained}')
+        metrics = self.metrics
+        if metrics is not None:
+            if metrics.is_request(topic):
+                metrics.request()
+                return
+            metrics.received += 1
+        inbox = self.inbox
+        if inbox is None:
+            self.handle(topic, msg, retained)
+        elif not inbox.put(topic, msg, retained) and metrics is not None:
+            metrics.dropped += 1  # Overflow or superseded
+
+    def drain(self):  # Draw queued messages
+        if self.inbox:  # Not None or empty
+            self.inbox.drain(self._handler)
+
+    # Parse and draw one message, msg[:end] (all of it if end is None). Any
+    # error drops just this message: drain() runs in the render task, which
+    # must keep going.
+    def handle(self, topic, msg, retained, end=None):
+        try:
+            self._handle(topic, msg, retained, len(msg) if end is None else end)
+        except Exception as e:
+            print("Error: Dropping message:", repr(e))
+            if self.metrics is not None:
+                self.metrics.dropped += 1
+
+    def _handle(self, topic, msg, retained, end):
+        metrics = self.metrics
+        if metrics is not None:
+            t = time.ticks_us()
+        pool = self.pool
+        if end and msg[0] == MAGIC:
+            if type(msg) is bytearray:  # Inbox buffer: frame data as views, not copies
+                msg = memoryview(msg)
+            batch = parse_binary(msg, pool, end)
+        else:
+            batch = parse_batch(msg, pool, end)
+        if metrics is not None:
+            t1 = time.ticks_us()
+            metrics.parse.add(time.ticks_diff(t1, t))
+        if not batch:
+            if metrics is not None:
+                metrics.dropped += 1
+            return
+
+        # Commands with a receive handler (sprite chunks, define) lead the
+        # message; the rest of it is drawn.
+        i = 0
+        n = len(batch)
+        while i < n:
+            receive = COMMANDS[batch[i].op].receive
+            if receive is None:
+                break
+            i = receive(self, batch, i, msg, end)
+        if i == n:
+            return
+        if i:
+            batch = batch[i:]
+
+        # The whole batch is drawn before the render task runs again, so it
+        # reaches the panel as one frame.
+        if self.layers is None or not self.layers.update(topic, batch):
+            renderer = self.renderer
+            for cmd in batch:
+                renderer.draw(cmd)  # Damaged region is pushed by renderer.run()
+            if pool is not None:
+                pool.release(batch)  # Animations and widgets keep copies
+        if metrics is not None:
+            metrics.draw.add(time.ticks_diff(time.ticks_us(), t1))
+
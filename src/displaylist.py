@@ -0,0 +1,87 @@
+import os
+
+from binary import parse_binary, MAGIC
+from command import parse_batch, OP_DEFINE, OP_FRAME
+
+# Named display lists (see "define" and "call" in PROTOCOL.md).
+#
+# A definition is kept as its parsed Commands, so `call` replays it without
+# touching the text parser. With a directory set by .open(), each definition's
+# message is also written to flash (only if changed) and reloaded at boot.
+
+_NAME_MAX = 32
+
+
+def _valid(name):  # Names double as file names
+    if not 0 < len(name) <= _NAME_MAX:
+        return False
+    for c in name:
+        if not (c.isalpha() or c.isdigit() or c in "_-"):
+            return False
+    return True
+
+
+class DisplayLists:
+    def __init__(self, max_lists=16):
+        self.max_lists = max_lists
+        self.path = None
+        self._lists = {}
+
+    def get(self, name):  # Commands, or None
+        return self._lists.get(name)
+
+    # Store commands under name, or delete it if there are none. payload is
+    # the defining message, written to flash if persisting. Returns False
+    # after printing an error.
+    def define(self, name, commands, payload=None):
+        if not _valid(name):
+            print("Error: Invalid display list name.")
+            return False
+        if not commands:
+            if self._lists.pop(name, None) is not None and self.path:
+                try:
+                    os.remove(self.path + "/" + name)
+                except OSError:
+                    pass
+            return True
+        if name not in self._lists and len(self._lists) >= self.max_lists:
+            print("Error: Too many display lists.")
+            return False
+        for cmd in commands:
+            if cmd.op == OP_DEFINE:
+                print("Error: Command 'define' must come first.")
+                return False
+            if cmd.op == OP_FRAME:
+                cmd.data = bytes(cmd.data)  # May be a view of the receive buffer
+        self._lists[name] = commands
+        if self.path and payload is not None:
+            self._save(name, bytes(payload))
+        return True
+
+    # Persist definitions in directory path and load those saved there.
+    def open(self, path):
+        self.path = path
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass  # Exists
+        for name in os.listdir(path):
+            with open(path + "/" + name, "rb") as f:
+                payload = f.read()
+            if payload and payload[0] == MAGIC:
+                batch = parse_binary(payload)
+            else:
+                batch = parse_batch(payload)
+            if batch and batch[0].op == OP_DEFINE and batch[0].content == name:
+                self.define(name, batch[1:])
+
+    def _save(self, name, payload):
+        file = self.path + "/" + name
+        try:
+            with open(file, "rb") as f:
+                if f.read() == payload:
+                    return  # Unchanged: spare the flash
+        except OSError:
+            pass
+        with open(file, "wb") as f:
+            f.write(payload)
@@ -0,0 +1,196 @@
+import micropython
+from array import array
+
+from pens import PALETTE_INDEX
+
+# Raw framebuffer streaming. Pixel data received in an OP_FRAME command is
+# written straight into the PicoGraphics framebuffer by a viper loop, with no
+# per-pixel Python calls or intermediate copies.
+#
+# Pixel formats of the received data (little-endian):
+FMT_RGB565 = 0
+FMT_RGB888 = 1  # 3 bytes per pixel, R G B
+FMT_INDEXED = 2  # 1 byte per pixel, a palette index (see pens.PALETTE_INDEX)
+# Encodings:
+ENC_RAW = 0  # w * h pixels
+ENC_RLE = 1  # Run-length tokens, see below
+#
+# ENC_RLE is a stream of tokens, each a control byte c followed by pixel data.
+# n = (c & 0x3F) + 1 and the token type is c >> 6:
+#   0  skip n pixels: leave them as they are in the previous frame (delta),
+#      or for sprites, transparent
+#   1  repeat the following pixel n times
+#   2  n literal pixels follow
+#   3  skip n * 64 pixels
+#
+# Supported framebuffers are PicoGraphics PEN_RGB888 (32 bits per pixel,
+# 0x00RRGGBB) and PEN_RGB565 (16 bits per pixel, big-endian).
+
+_P_STRIDE = 0  # Parameter slots passed to the viper decoder
+_P_X = 1
+_P_Y = 2
+_P_W = 3
+_P_H = 4
+_P_LEN = 5
+_P_SBPP = 6
+_P_DBPP = 7
+_P_ENC = 8
+_P_CX0 = 9  # Clip rect: pixels outside it are decoded but not written
+_P_CY0 = 10
+_P_CX1 = 11
+_P_CY1 = 12
+_P_COLORS = 13  # Palette size
+
+
+# Returns the number of pixels consumed (skipped or written), or -1 if the
+# data is malformed.
+@micropython.viper
+def _decode(dst: ptr8, src: ptr8, p: ptr32, pal: ptr32) -> int:
+    stride = int(p[0])
+    x0 = int(p[1])
+    y0 = int(p[2])
+    w = int(p[3])
+    total = w * int(p[4])
+    n = int(p[5])
+    sbpp = int(p[6])
+    dbpp = int(p[7])
+    rle = int(p[8])
+    cx0 = int(p[9])
+    cy0 = int(p[10])
+    cx1 = int(p[11])
+    cy1 = int(p[12])
+    colors = int(p[13])
+    i = 0  # Source index
+    px = 0  # Pixels consumed
+    col = 0
+    row = 0
+    run = 0  # Pixels left in the current token
+    kind = 2  # ENC_RAW behaves as one long literal run
+    if not rle:
+        run = total
+    rgb = 0
+    while px < total:
+        if run == 0:
+            if i >= n:
+                return -1
+            c = int(src[i])
+            i += 1
+            kind = c >> 6
+            run = (c & 0x3F) + 1
+            if kind == 3:
+                kind = 0
+                run = run << 6
+            if kind == 1:
+                if i + sbpp > n:
+                    return -1
+                if sbpp == 2:
+                    v = int(src[i]) | int(src[i + 1]) << 8
+                    rgb = (v & 0xF800) << 8 | (v & 0x07E0) << 5 | (v & 0x001F) << 3
+                elif sbpp == 1:
+                    v = int(src[i])
+                    if v >= colors:
+                        return -1
+                    rgb = int(pal[v])
+                else:
+                    rgb = int(src[i]) << 16 | int(src[i + 1]) << 8 | int(src[i + 2])
+                i += sbpp
+        if kind == 2:
+            if i + sbpp > n:
+                return -1
+            if sbpp == 2:
+                v = int(src[i]) | int(src[i + 1]) << 8
+                rgb = (v & 0xF800) << 8 | (v & 0x07E0) << 5 | (v & 0x001F) << 3
+            elif sbpp == 1:
+                v = int(src[i])
+                if v >= colors:
+                    return -1
+                rgb = int(pal[v])
+            else:
+                rgb = int(src[i]) << 16 | int(src[i + 1]) << 8 | int(src[i + 2])
+            i += sbpp
+        x = x0 + col
+        y = y0 + row
+        if kind != 0 and cx0 <= x and x < cx1 and cy0 <= y and y < cy1:
+            o = (y * stride + x) * dbpp
+            if dbpp == 4:
+                dst[o] = rgb & 0xFF
+                dst[o + 1] = (rgb >> 8) & 0xFF
+                dst[o + 2] = (rgb >> 16) & 0xFF
+                dst[o + 3] = 0
+            else:
+                v = (rgb >> 8 & 0xF800) | (rgb >> 5 & 0x07E0) | (rgb >> 3 & 0x001F)
+                dst[o] = v >> 8
+                dst[o + 1] = v & 0xFF
+        run -= 1
+        px += 1
+        col += 1
+        if col == w:  # Next row of the rect
+            col = 0
+            row += 1
+    return px
+
+
+class FrameDecoder:
+    def __init__(self, graphics, width, height):
+        self.width = width
+        self.height = height
+        self.fb = memoryview(graphics)  # PicoGraphics exposes its framebuffer
+        self.dbpp = len(self.fb) // (width * height)
+        if self.dbpp != 4 and self.dbpp != 2:
+            raise ValueError("Unsupported framebuffer pen type")
+        self._params = array("i", (0 for _ in range(14)))
+        self._palette = array("i", (0 for _ in range(256)))
+
+    # Decode an OP_FRAME command into the framebuffer at x, y (cmd.x, cmd.y
+    # if not given). Returns False after printing an error if the frame does
+    # not fit or its data is malformed.
+    def draw(self, cmd, x=None, y=None):
+        if x is None:
+            x = cmd.x
+            y = cmd.y
+        w = cmd.w
+        h = cmd.h
+        if x < 0 or y < 0 or w <= 0 or h <= 0 or x + w > self.width or y + h > self.height:
+            print("Error: Frame outside display.")
+            return False
+        return self._draw(cmd.fmt, cmd.data, x, y, w, h, 0, 0, self.width, self.height)
+
+    # Decode a Sprite at x, y, which may lie partly outside the display,
+    # writing only pixels within the clip rect cx0, cy0 - cx1, cy1.
+    def blit(self, sprite, x, y, cx0, cy0, cx1, cy1):
+        return self._draw(sprite.fmt, sprite.data, x, y, sprite.w, sprite.h, cx0, cy0, cx1, cy1)
+
+    def _draw(self, fmt, data, x, y, w, h, cx0, cy0, cx1, cy1):
+        enc = fmt & 0x0F
+        fmt >>= 4
+        if fmt > FMT_INDEXED or enc > ENC_RLE:
+            print("Error: Unsupported frame format.")
+            return False
+        sbpp = 2 if fmt == FMT_RGB565 else 1 if fmt == FMT_INDEXED else 3
+        if enc == ENC_RAW and len(data) != w * h * sbpp:
+            print("Error: Frame data size mismatch.")
+            return False
+        pal = self._palette
+        colors = min(len(PALETTE_INDEX), 256)  # Indices are one byte
+        if fmt == FMT_INDEXED:
+            for i in range(colors):
+                pal[i] = PALETTE_INDEX[i]
+        p = self._params
+        p[_P_STRIDE] = self.width
+        p[_P_X] = x
+        p[_P_Y] = y
+        p[_P_W] = w
+        p[_P_H] = h
+        p[_P_LEN] = len(data)
+        p[_P_SBPP] = sbpp
+        p[_P_DBPP] = self.dbpp
+        p[_P_ENC] = enc
+        p[_P_CX0] = max(cx0, 0)
+        p[_P_CY0] = max(cy0, 0)
+        p[_P_CX1] = min(cx1, self.width)
+        p[_P_CY1] = min(cy1, self.height)
+        p[_P_COLORS] = colors
+        if _decode(self.fb, data, p, pal) < 0:
+            print("Error: Malformed frame data.")
+            return False
+        return True
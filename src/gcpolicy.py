@@ -0,0 +1,48 @@
+import gc
+import time
+
+# Garbage collection scheduled around rendering.
+#
+# Instead of collecting on a fixed timer, or whenever the heap happens to run
+# low in the middle of a draw or a packet read, the render task calls
+# .idle() in the gap after each frame is pushed, when the inbox has been
+# drained. It collects once threshold bytes have been allocated since the
+# last collection, and only if the expected pause (a running average of past
+# ones) fits in what is left of the frame, unless twice the threshold has
+# built up. MicroPython's own collection threshold is set above that, so it
+# only steps in if scheduled collections fall behind.
+#
+# With a Metrics instance, collections are counted and their pauses timed.
+class GCPolicy:
+    def __init__(self, threshold=16384, metrics=None):
+        self.threshold = threshold
+        self.metrics = metrics
+        self._pause_us = 0  # Running average
+        try:
+            gc.threshold(4 * threshold)
+        except AttributeError:  # Not MicroPython
+            pass
+        self._base = gc.mem_alloc()  # Heap in use after the last collection
+
+    # Collect if due and, given budget_ms (time until the next frame), if
+    # the pause is expected to fit. Returns True if it collected.
+    def idle(self, budget_ms=None):
+        allocated = gc.mem_alloc() - self._base
+        if allocated < self.threshold:
+            return False
+        if (budget_ms is not None and budget_ms * 1000 < self._pause_us
+                and allocated < 2 * self.threshold):
+            return False  # Wait for a longer gap
+        self.collect()
+        return True
+
+    def collect(self):
+        t = time.ticks_us()
+        gc.collect()
+        pause = time.ticks_diff(time.ticks_us(), t)
+        self._base = gc.mem_alloc()
+        self._pause_us = pause if not self._pause_us else (3 * self._pause_us + pause) // 4
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.gc_pause.add(pause)
+            metrics.gc_count += 1
@@ -0,0 +1,135 @@
+import micropython
+
+# Bounded queue of received MQTT messages.
+#
+# The MQTT client calls its subscription callback while holding the client
+# lock, so drawing there stalls socket reads, PUBACKs and pings. Instead the
+# callback copies the message in here and the render task drains the queue
+# once per frame tick. When the queue is full the policy decides what is lost:
+#
+#   DROP_OLDEST  discard the oldest queued message (freshest state wins)
+#   DROP_NEWEST  discard the incoming message (no backlog replay either way)
+#   COALESCE     keep only the latest payload per topic, in the queue slot of
+#                the first pending one; if the topic is new, drop the oldest
+#
+# Nothing is allocated per message: each slot owns a buf_size byte buffer the
+# payload is copied into, one larger payload at a time (a frame) goes into a
+# shared large_size buffer, and the last `topics` topics seen are kept as
+# bytes, so a known topic is not copied again. Only further large payloads
+# get a buffer of their own.
+
+DROP_OLDEST = 0
+DROP_NEWEST = 1
+COALESCE = 2
+
+
+@micropython.viper
+def _copy(dst: ptr8, src: ptr8, n: int):  # dst[:n] = src[:n], without a slice
+    for i in range(n):
+        dst[i] = src[i]
+
+
+@micropython.viper
+def _same(a: ptr8, b: ptr8, n: int) -> bool:  # a[:n] == b[:n]
+    for i in range(n):
+        if a[i] != b[i]:
+            return False
+    return True
+
+
+class Inbox:
+    def __init__(self, size=16, policy=DROP_OLDEST, buf_size=256, topics=8, large_size=0):
+        if policy not in (DROP_OLDEST, DROP_NEWEST, COALESCE):
+            raise ValueError("Invalid inbox policy.")
+        self.size = size
+        self.policy = policy
+        self._bufs = [bytearray(buf_size) for _ in range(size)]
+        self._topics = [None] * size  # Ring buffer of (topic, msg[:length], retained)
+        self._msgs = [None] * size  # _bufs[i], or a buffer for a larger payload
+        self._lens = [0] * size
+        self._retained = [False] * size
+        self._large = bytearray(large_size)
+        self._large_free = True
+        self._head = 0  # Oldest message
+        self._count = 0
+        self._known = [b""] * topics  # Interned topics, oldest at _next
+        self._next = 0
+
+    def __len__(self):
+        return self._count
+
+    # Queue a copy of a message; topic and msg may be memoryviews. Returns
+    # False if this, or an earlier message, was discarded.
+    def put(self, topic, msg, retained):
+        size = self.size
+        topic = self._intern(topic)
+        if self.policy == COALESCE:
+            n = len(topic)
+            for k in range(self._count):
+                i = (self._head + k) % size
+                t = self._topics[i]
+                if t is topic or len(t) == n and _same(t, topic, n):  # May be evicted from _known
+                    self._store(i, msg, retained)
+                    return False
+        kept = True
+        if self._count == size:
+            if self.policy == DROP_NEWEST:
+                return False
+            self._release(self._head)
+            self._head = (self._head + 1) % size
+            self._count -= 1
+            kept = False
+        i = (self._head + self._count) % size
+        self._topics[i] = topic
+        self._store(i, msg, retained)
+        self._count += 1
+        return kept
+
+    # Call handler(topic, msg, retained, length) for each queued message,
+    # oldest first. msg is the slot's buffer, holding the payload in
+    # msg[:length]; it is reused once the handler returns.
+    def drain(self, handler):
+        size = self.size
+        while self._count:
+            i = self._head
+            topic = self._topics[i]
+            msg = self._msgs[i]
+            retained = self._retained[i]
+            self._release(i)
+            self._head = (i + 1) % size
+            self._count -= 1
+            handler(topic, msg, retained, self._lens[i])
+
+    def _intern(self, topic):  # The topic as bytes, the same object each time
+        known = self._known
+        n = len(topic)
+        for k in range(len(known)):
+            t = known[k]
+            if len(t) == n and _same(t, topic, n):
+                return t
+        t = bytes(topic)
+        known[self._next] = t
+        self._next = (self._next + 1) % len(known)
+        return t
+
+    def _store(self, i, msg, retained):
+        n = len(msg)
+        if self._msgs[i] is self._large:  # Coalesced: replaced
+            self._large_free = True
+        buf = self._bufs[i]
+        if n > len(buf):
+            buf = self._large
+            if self._large_free and n <= len(buf):
+                self._large_free = False
+            else:
+                buf = bytearray(n)  # Collected once drained
+        _copy(buf, msg, n)
+        self._msgs[i] = buf
+        self._lens[i] = n
+        self._retained[i] = retained
+
+    def _release(self, i):  # Let a large payload be collected, or reused
+        if self._msgs[i] is self._large:
+            self._large_free = True
+        self._topics[i] = None
+        self._msgs[i] = None
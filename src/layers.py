@@ -0,0 +1,167 @@
+from command import OP_CALL, OP_FRAME, OP_LAYER
+
+# Per-topic layers (see "Layers" in PROTOCOL.md).
+#
+# A message whose first command is `layer` gives its topic (or the layer named
+# by layer=) a region and a stacking order. The rest of that message, and of
+# later messages on the same topic, replaces the layer's content: a command
+# list kept parsed in memory, with coordinates relative to the region.
+#
+# When a layer changes, only its region is recomposited: the background is
+# filled, then every layer overlapping the region is replayed bottom to top,
+# clipped to its own region. Content identical to what a layer already holds
+# (e.g. retained messages resent after a reconnect) is not redrawn.
+
+
+class Layer:
+    __slots__ = ("key", "z", "x", "y", "w", "h", "commands", "shown")
+
+    def __init__(self, key):
+        self.key = key
+        self.z = 0
+        self.x = self.y = self.w = self.h = 0
+        self.commands = ()
+        self.shown = False  # On the panel, not cleared since
+
+
+def _same_commands(a, b):
+    if len(a) != len(b):
+        return False
+    for i in range(len(a)):
+        if not a[i].equals(b[i]):
+            return False
+    return True
+
+
+class Compositor:
+    def __init__(self, renderer, max_layers=16):
+        self.renderer = renderer
+        self.max_layers = max_layers
+        self._stack = []  # Bottom to top
+        self._by_key = {}  # Layer name or topic -> Layer
+        self._by_topic = {}  # Topic -> Layer it last addressed
+        renderer.layers = self  # A panel clear calls .forget()
+
+    # Apply a parsed message. Returns False if it is not for a layer (no
+    # layer header and its topic has none), so should be drawn directly.
+    def update(self, topic, batch):
+        if type(topic) is not bytes:
+            topic = bytes(topic)  # memoryview
+        head = batch[0]
+        if head.op == OP_LAYER:
+            commands = batch[1:]
+            layer = self._by_key.get(topic if head.layer is None else head.layer)
+        else:
+            layer = self._by_topic.get(topic)
+            if layer is None:
+                return False
+            commands = batch[:]  # Kept: the caller may reuse batch
+        for cmd in commands:
+            if cmd.op == OP_LAYER:
+                print("Error: Command 'layer' must come first.")
+                return True
+
+        if head.op == OP_LAYER:
+            if head.w <= 0 or head.h <= 0:  # Empty region: remove
+                if layer is not None:
+                    self._remove(layer)
+                return True
+            if layer is None:
+                if len(self._stack) >= self.max_layers:
+                    print("Error: Too many layers.")
+                    return True
+                layer = Layer(topic if head.layer is None else head.layer)
+                self._by_key[layer.key] = layer
+            self._by_topic[topic] = layer
+            x, y, w, h, z = head.x, head.y, head.w, head.h, head.z
+        else:
+            x, y, w, h, z = layer.x, layer.y, layer.w, layer.h, layer.z
+
+        for cmd in commands:
+            if cmd.op == OP_FRAME:
+                if cmd.x < 0 or cmd.y < 0 or cmd.x + cmd.w > w or cmd.y + cmd.h > h:
+                    print("Error: Frame outside layer.")
+                    return True
+                cmd.data = bytes(cmd.data)  # May be a view of the receive buffer
+
+        moved = x != layer.x or y != layer.y or w != layer.w or h != layer.h
+        if (layer.shown and not moved and z == layer.z
+                and _same_commands(commands, layer.commands)):
+            return True
+        x0, y0, x1, y1 = layer.x, layer.y, layer.x + layer.w, layer.y + layer.h
+        if z != layer.z or layer not in self._stack:
+            if layer in self._stack:
+                self._stack.remove(layer)
+            self._insert(layer, z)
+        layer.x, layer.y, layer.w, layer.h = x, y, w, h
+        layer.commands = commands
+        layer.shown = True
+        if moved and x0 < x1:  # Also repaint the old region
+            self._compose(min(x0, x), min(y0, y), max(x1, x + w), max(y1, y + h))
+        else:
+            self._compose(x, y, x + w, y + h)
+        return True
+
+    # The panel was cleared: the layers are kept, but their next update is
+    # drawn even if it is unchanged.
+    def forget(self):
+        for layer in self._stack:
+            layer.shown = False
+
+    # Repaint layers calling display list name, after it was redefined.
+    def refresh(self, name):
+        for layer in self._stack:
+            for cmd in layer.commands:
+                if cmd.op == OP_CALL and cmd.content == name:
+                    self._compose(layer.x, layer.y, layer.x + layer.w, layer.y + layer.h)
+                    break
+
+    def _insert(self, layer, z):  # Above all layers with z <= its z
+        layer.z = z
+        stack = self._stack
+        i = len(stack)
+        while i > 0 and stack[i - 1].z > z:
+            i -= 1
+        stack.insert(i, layer)
+
+    def _remove(self, layer):
+        self._stack.remove(layer)
+        del self._by_key[layer.key]
+        for topic in [t for t, v in self._by_topic.items() if v is layer]:
+            del self._by_topic[topic]
+        self._compose(layer.x, layer.y, layer.x + layer.w, layer.y + layer.h)
+
+    # Repaint the panel region x0, y0 - x1, y1 from the layers.
+    def _compose(self, x0, y0, x1, y1):
+        # Frames ignore the clip rect: grow the region to cover whole layers
+        # holding frames, so layers above them are repainted too.
+        grown = True
+        while grown:
+            grown = False
+            for layer in self._stack:
+                lx1 = layer.x + layer.w
+                ly1 = layer.y + layer.h
+                if (layer.x < x0 or layer.y < y0 or lx1 > x1 or ly1 > y1) and \
+                        x0 < lx1 and layer.x < x1 and y0 < ly1 and layer.y < y1 and \
+                        any(cmd.op == OP_FRAME for cmd in layer.commands):
+                    x0 = min(x0, layer.x)
+                    y0 = min(y0, layer.y)
+                    x1 = max(x1, lx1)
+                    y1 = max(y1, ly1)
+                    grown = True
+        renderer = self.renderer
+        renderer.fill(x0, y0, x1 - x0, y1 - y0)
+        for layer in self._stack:
+            lx0 = max(x0, layer.x)
+            ly0 = max(y0, layer.y)
+            lx1 = min(x1, layer.x + layer.w)
+            ly1 = min(y1, layer.y + layer.h)
+            if lx0 >= lx1 or ly0 >= ly1:
+                continue
+            renderer.clip(lx0, ly0, lx1 - lx0, ly1 - ly0)
+            renderer.ox = layer.x
+            renderer.oy = layer.y
+            for cmd in layer.commands:
+                renderer.draw(cmd)
+        renderer.ox = renderer.oy = 0
+        renderer.clip()
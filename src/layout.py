@@ -0,0 +1,286 @@
+import micropython
+from array import array
+
+from command import FONTS, ALIGN_CENTER, ALIGN_RIGHT, ALIGN_MASK, WRAP
+
+# Text layout (see the text attributes in PROTOCOL.md).
+#
+# A text command's content is broken into lines (at newlines and, with
+# wrap=true, between words to fit the rect width) and each line is given an
+# x offset for its alignment. Layouts are cached on everything that affects
+# them, so redrawing the same text measures nothing.
+#
+# Outlines are drawn from a glyph mask: the text is rendered once into a
+# corner of the framebuffer (which is saved and restored around it), the lit
+# pixels are read back and grown by the outline width, and the ring is kept
+# with the layout. Drawing an outline is then one viper pass over the mask
+# instead of one text draw per neighbouring offset.
+
+# Glyph height in pixels at scale 1, for text extents
+FONT_HEIGHTS = dict(FONTS)
+
+_GLYPH = 2  # Mask cells
+_RING = 1
+
+_P_STRIDE = 0  # Parameter slots passed to the viper helpers
+_P_X = 1
+_P_Y = 2
+_P_W = 3
+_P_H = 4
+_P_DBPP = 5
+_P_SIZE = 6  # Outline width
+_P_CX0 = 7  # Clip rect
+_P_CY0 = 8
+_P_CX1 = 9
+_P_CY1 = 10
+_P_RGB = 11
+
+
+@micropython.viper
+def _extract(fb: ptr8, mask: ptr8, p: ptr32):  # Lit pixels at 0, 0 to _GLYPH
+    stride = int(p[0])
+    w = int(p[3])
+    h = int(p[4])
+    dbpp = int(p[5])
+    for y in range(h):
+        o = y * stride * dbpp
+        m = y * w
+        for x in range(w):
+            if fb[o] | fb[o + 1] | fb[o + dbpp - 2]:
+                mask[m + x] = 2
+            o += dbpp
+
+
+@micropython.viper
+def _dilate(mask: ptr8, p: ptr32):  # Empty cells within size of a glyph to _RING
+    w = int(p[3])
+    h = int(p[4])
+    s = int(p[6])
+    for y in range(h):
+        for x in range(w):
+            if mask[y * w + x] != 0:
+                continue
+            y0 = y - s if y > s else 0
+            y1 = y + s + 1 if y + s + 1 < h else h
+            x0 = x - s if x > s else 0
+            x1 = x + s + 1 if x + s + 1 < w else w
+            hit = 0
+            ny = y0
+            while ny < y1 and not hit:
+                nx = x0
+                while nx < x1:
+                    if mask[ny * w + nx] == 2:
+                        hit = 1
+                        break
+                    nx += 1
+                ny += 1
+            if hit:
+                mask[y * w + x] = 1
+
+
+@micropython.viper
+def _blit(fb: ptr8, mask: ptr8, p: ptr32):  # _RING cells to colour, clipped
+    stride = int(p[0])
+    x0 = int(p[1])
+    y0 = int(p[2])
+    w = int(p[3])
+    h = int(p[4])
+    dbpp = int(p[5])
+    cx0 = int(p[7])
+    cy0 = int(p[8])
+    cx1 = int(p[9])
+    cy1 = int(p[10])
+    rgb = int(p[11])
+    v = (rgb >> 8 & 0xF800) | (rgb >> 5 & 0x07E0) | (rgb >> 3 & 0x001F)
+    for y in range(h):
+        py = y0 + y
+        if py < cy0 or py >= cy1:
+            continue
+        m = y * w
+        for x in range(w):
+            px = x0 + x
+            if px < cx0 or px >= cx1 or mask[m + x] != 1:
+                continue
+            o = (py * stride + px) * dbpp
+            if dbpp == 4:
+                fb[o] = rgb & 0xFF
+                fb[o + 1] = (rgb >> 8) & 0xFF
+                fb[o + 2] = (rgb >> 16) & 0xFF
+                fb[o + 3] = 0
+            else:
+                fb[o] = v >> 8
+                fb[o + 1] = v & 0xFF
+
+
+class Layout:
+    __slots__ = (
+        "content", "font", "scale", "w", "flow", "lines", "offsets", "left", "right",
+        "height", "line_height", "mask", "mask_x", "mask_w", "mask_h", "outline", "stamp"
+    )
+
+    def __init__(self):
+        self.content = None  # Key
+        self.font = None
+        self.scale = 1
+        self.w = 0
+        self.flow = 0
+        self.lines = ()
+        self.offsets = ()  # x of each line, relative to the rect
+        self.left = self.right = 0  # Extent of the lines, relative to the rect
+        self.height = 0
+        self.line_height = 0
+        self.mask = None  # Outline mask, built on first use
+        self.mask_x = 0  # Mask origin relative to the rect; y is -outline
+        self.mask_w = self.mask_h = 0
+        self.outline = 0  # Width the mask was built for
+        self.stamp = 0  # Last use
+
+
+# Bounded cache of Layouts. When full, the least recently used is rebuilt
+# for the new text.
+class LayoutCache:
+    def __init__(self, renderer, size=16):
+        self.renderer = renderer
+        self._text = renderer.graphics.text  # Bound once, see text()
+        self._layouts = [Layout() for _ in range(size)]
+        self._tick = 0
+        self._params = array("i", (0 for _ in range(12)))
+
+    # Layout of content in the renderer's current font, for a rect of width
+    # w (0: as wide as the text).
+    def get(self, content, scale, w, flow):
+        font = self.renderer.font
+        flow &= ALIGN_MASK | WRAP
+        self._tick += 1
+        oldest = None
+        for lay in self._layouts:
+            if (lay.content == content and lay.font == font and lay.scale == scale
+                    and lay.w == w and lay.flow == flow):
+                lay.stamp = self._tick
+                return lay
+            if oldest is None or lay.stamp < oldest.stamp:
+                oldest = lay
+        lay = oldest
+        lay.content = content
+        lay.font = font
+        lay.scale = scale
+        lay.w = w
+        lay.flow = flow
+        lay.mask = None
+        lay.stamp = self._tick
+        self._build(lay)
+        return lay
+
+    def _build(self, lay):
+        measure = self.renderer.graphics.measure_text
+        scale = lay.scale
+        lines = []
+        for para in lay.content.split("\n"):
+            if not lay.flow & WRAP or lay.w <= 0 or measure(para, scale) <= lay.w:
+                lines.append(para)
+                continue
+            line = ""
+            for word in para.split(" "):
+                wider = line + " " + word if line else word
+                if line and measure(wider, scale) > lay.w:
+                    lines.append(line)  # A word too long for a line overflows it
+                    line = word
+                else:
+                    line = wider
+            lines.append(line)
+        widths = [measure(line, scale) for line in lines]
+        width = max(widths)
+        box = lay.w if lay.w > 0 else width
+        align = lay.flow & ALIGN_MASK
+        if align == ALIGN_CENTER:
+            offsets = [(box - lw) // 2 for lw in widths]
+        elif align == ALIGN_RIGHT:
+            offsets = [box - lw for lw in widths]
+        else:
+            offsets = [0] * len(lines)
+        lay.lines = lines
+        lay.offsets = offsets
+        lay.left = min(offsets)
+        lay.right = max(offsets[i] + widths[i] for i in range(len(lines)))
+        lay.line_height = FONT_HEIGHTS.get(lay.font, 16) * scale
+        lay.height = lay.line_height * len(lines)
+
+    # Draw the outline of lay, placed with its rect at x, y, in colour rgb.
+    # The renderer's font and clip must be set for the text.
+    def outline(self, lay, size, x, y, rgb):
+        r = self.renderer
+        if lay.mask is None or lay.outline != size:
+            if not self._mask(lay, size):  # Too large for the framebuffer
+                pen = r.pens.get(rgb)
+                r.graphics.set_pen(pen)
+                r.fg = rgb
+                for dy in (-size, 0, size):
+                    for dx in (-size, 0, size):
+                        if dx or dy:
+                            self.text(lay, x + dx, y + dy)
+                return
+        p = self._params
+        p[_P_STRIDE] = r.width
+        p[_P_X] = x + lay.mask_x
+        p[_P_Y] = y - size
+        p[_P_W] = lay.mask_w
+        p[_P_H] = lay.mask_h
+        p[_P_DBPP] = r.frames.dbpp
+        p[_P_CX0] = r.cx0
+        p[_P_CY0] = r.cy0
+        p[_P_CX1] = r.cx1
+        p[_P_CY1] = r.cy1
+        p[_P_RGB] = rgb
+        _blit(r.frames.fb, lay.mask, p)
+
+    # Draw the lines with the current pen. Taking graphics.text here would
+    # allocate a bound method on every call under MicroPython.
+    def text(self, lay, x, y):
+        text = self._text
+        for i in range(len(lay.lines)):
+            text(lay.lines[i], x + lay.offsets[i], y, scale=lay.scale)
+            y += lay.line_height
+
+    def _mask(self, lay, size):  # Returns False if it does not fit the panel
+        r = self.renderer
+        mx = lay.left - size
+        mw = lay.right - lay.left + 2 * size
+        mh = lay.height + 2 * size
+        if mw > r.width or mh > r.height:
+            return False
+        fb = r.frames.fb
+        dbpp = r.frames.dbpp
+        graphics = r.graphics
+        n = mw * dbpp
+        saved = bytearray(n * mh)
+        blank = bytearray(n)
+        for row in range(mh):
+            o = row * r.width * dbpp
+            saved[row * n:row * n + n] = fb[o:o + n]
+            fb[o:o + n] = blank
+        graphics.set_clip(0, 0, mw, mh)
+        graphics.set_pen(r.pens.get(0xFFFFFF))
+        r.fg = 0xFFFFFF
+        self.text(lay, -mx, size)
+        mask = bytearray(mw * mh)
+        p = self._params
+        p[_P_STRIDE] = r.width
+        p[_P_W] = mw
+        p[_P_H] = mh
+        p[_P_DBPP] = dbpp
+        p[_P_SIZE] = size
+        _extract(fb, mask, p)
+        for row in range(mh):
+            o = row * r.width * dbpp
+            fb[o:o + n] = saved[row * n:row * n + n]
+        if r.clipped:
+            graphics.set_clip(r.cx0, r.cy0, r.cx1 - r.cx0, r.cy1 - r.cy0)
+        else:
+            graphics.remove_clip()
+        _dilate(mask, p)
+        lay.mask = mask
+        lay.mask_x = mx
+        lay.mask_w = mw
+        lay.mask_h = mh
+        lay.outline = size
+        return True
@@ -5,7 +5,6 @@ import uasyncio as asyncio
 import machine
 import random
 import re
-import time
 from secrets import (
     WIFI_SSID,
     WIFI_PASSWORD,
@@ -16,11 +15,32 @@ from secrets import (
     MQTT_CLIENT_ID,
 )  # type: ignore
 
-from helpers import hex_to_rgb
-from mqtt import parse_mqtt_message
+from command import CommandPool
+from dispatch import Dispatcher
+from inbox import Inbox, DROP_OLDEST
+from gcpolicy import GCPolicy
+from layers import Compositor
+from metrics import Metrics
+from renderer import Renderer
 
-FRAME_DELAY = 0.01
+MAX_FPS = 30  # Upper bound on panel updates per second
 BRIGHTNESS = 100
+PEN_CACHE_SIZE = 16  # Distinct colours kept as pens, besides the palette
+INBOX_SIZE = 16  # Messages queued for the render task
+INBOX_POLICY = DROP_OLDEST  # Or DROP_NEWEST, or COALESCE (latest payload per topic)
+INBOX_BUF_SIZE = 256  # Bytes per queued message
+INBOX_LARGE_SIZE = 128 * 128 * 2 + 64  # One larger message, such as a full RGB565 frame
+COMMAND_POOL_SIZE = 16  # Command records reused between messages
+MAX_LAYERS = 16  # Topics (or layer= names) with a retained layer
+LISTS_DIR = "/lists"  # Display lists are saved here and reloaded at boot; None to keep in RAM
+SPRITE_CACHE_BYTES = 32 * 1024  # Sprite data kept in RAM
+SPRITES_DIR = "/sprites"  # Uploaded sprites are saved here; None to keep in RAM only
+UTC_OFFSET = 0  # Seconds added to UTC for clock widgets
+NTP_TIMEOUT = 1  # Seconds the (blocking) NTP query may stall the event loop
+NTP_RETRY = 60  # Seconds before trying again after a failed attempt
+GC_THRESHOLD = 16 * 1024  # Bytes allocated between collections
+STATS_TOPIC = "stats/" + MQTT_CLIENT_ID  # Outside i75/# so stats don't loop back
+STATS_INTERVAL = 60  # Seconds between stats publishes; publish to <topic>/get for one now
 
 config["ssid"] = WIFI_SSID
 config["wifi_pw"] = WIFI_PASSWORD
@@ -33,65 +53,29 @@ config["client_id"] = MQTT_CLIENT_ID
 print("BOOT")
 
 i75 = Interstate75(display=Interstate75.DISPLAY_INTERSTATE75_128X128)
-graphics = i75.display
+metrics = Metrics(STATS_TOPIC.encode())
+renderer = Renderer(i75, MAX_FPS, PEN_CACHE_SIZE, metrics=metrics)
+graphics = renderer.graphics
 width = i75.width
 height = i75.height
-
-
-def create_pen(color):
-    return graphics.create_pen(*hex_to_rgb(color))
-
-
-black = graphics.create_pen(0, 0, 0)
-white = graphics.create_pen(255, 255, 255)
-
-graphics.set_pen(black)
+renderer.widgets.utc_offset = UTC_OFFSET
+if LISTS_DIR:
+    renderer.lists.open(LISTS_DIR)
+renderer.sprites.max_bytes = SPRITE_CACHE_BYTES
+if SPRITES_DIR:
+    renderer.sprites.open(SPRITES_DIR)
+gc_policy = GCPolicy(GC_THRESHOLD, metrics)
+inbox = Inbox(INBOX_SIZE, INBOX_POLICY, INBOX_BUF_SIZE, large_size=INBOX_LARGE_SIZE)
+dispatcher = Dispatcher(
+    renderer, metrics, inbox, Compositor(renderer, MAX_LAYERS), CommandPool(COMMAND_POOL_SIZE)
+)
+
+graphics.set_pen(renderer.pens.get("black"))
 graphics.clear()
 i75.update(graphics)
 i75.set_led(0, 0, 0)
 
 
-def on_mqtt_message(topic, msg, retained):
-    print(f'Topic: "{topic.decode()}" Message: "{msg.decode()}" Retained: {retained}')
-    message = msg.decode("utf-8")
-    parsed = parse_mqtt_message(message)
-    if not parsed:
-        return
-
-    print(parsed)
-
-    command = parsed.get("command")
-    params = parsed.get("params")
-    style = params.get("style", {})
-    time_ms = time.ticks_ms()
-
-    if command == "clear":
-        print("CLEAR")
-        graphics.set_pen(black)
-        graphics.clear()
-
-    if command == "rect":
-        print("RECT")
-        rect = params["rect"]
-        if "color_fg" in style:
-            graphics.set_pen(create_pen(style["color_fg"]))
-        graphics.rectangle(rect["x"], rect["y"], rect["width"], rect["height"])
-
-    if command == "text":
-        print("TEXT")
-        rect = params["rect"]
-        content = params["content"]
-        if "color_fg" in style:
-            graphics.set_pen(create_pen(style["color_fg"]))
-        if "font" in style:
-            graphics.set_font(style["font"])
-        scale = int(style.get("scale", 1))
-        graphics.text(content, rect["x"], rect["y"], scale=scale)
-
-    i75.update(graphics)
-    time.sleep(FRAME_DELAY)
-
-
 async def heartbeat():
     s = True
     while True:
@@ -106,8 +90,33 @@ async def wifi_handler(state):
     await asyncio.sleep(1)
 
 
+connected = asyncio.Event()  # Set once the network is up, for sync_clock()
+
+
 async def on_mqtt_connect(client):
+    metrics.connects += 1
+    connected.set()
+    if client.session_present:  # Resumed: subscriptions kept, backlog follows
+        return
     await client.subscribe("i75/#", 1)
+    await client.subscribe(metrics.request_topic, 0)
+
+
+async def sync_clock(client):  # Set the RTC once, for clock widgets
+    try:
+        import ntptime
+    except ImportError:
+        return
+    ntptime.timeout = NTP_TIMEOUT
+    await connected.wait()  # First attempt as soon as the network is up
+    while True:
+        if client.isconnected():
+            try:
+                ntptime.settime()
+                return
+            except OSError:
+                pass  # Try again later
+        await asyncio.sleep(NTP_RETRY)
 
 
 async def main(client):
@@ -122,15 +131,22 @@ async def main(client):
 
 
 # --------------------- MQTT and Scheduler Setup ---------------------
-config["subs_cb"] = on_mqtt_message
+config["subs_cb"] = dispatcher.on_message
 config["wifi_coro"] = wifi_handler
 config["connect_coro"] = on_mqtt_connect
-config["clean"] = True
+config["clean"] = False  # Resume the session after a reconnect
+config["drain_budget"] = 16  # Packets handled per wakeup during bursts
+config["io_mode"] = "ready"  # Await socket readiness instead of sleep polling
+config["max_inflight"] = 8  # QoS 1 publishes awaiting PUBACK at once
+config["gc_collect"] = None  # gc_policy collects between frames instead of at 1 Hz
 
 MQTTClient.DEBUG = True  # Optional debug output
 client = MQTTClient(config)
 
 asyncio.create_task(heartbeat())
+asyncio.create_task(renderer.run(dispatcher.drain, gc_policy))
+asyncio.create_task(metrics.run(client, STATS_INTERVAL))
+asyncio.create_task(sync_clock(client))
 
 try:
     asyncio.run(main(client))
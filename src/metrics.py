@@ -0,0 +1,126 @@
+import gc
+import json
+import time
+from array import array
+
+import uasyncio as asyncio
+
+# Histogram bucket upper edges in microseconds; the last bucket is open ended.
+_EDGES_US = (100, 200, 500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000)
+_LAG_PERIOD_MS = 100  # Loop lag probe interval
+
+
+# Fixed-size latency histogram: recording a value allocates nothing.
+class Histogram:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.buckets = array("I", (0 for _ in range(len(_EDGES_US) + 1)))
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total = 0
+        self.max = 0
+        for i in range(len(self.buckets)):
+            self.buckets[i] = 0
+
+    def add(self, us):
+        self.count += 1
+        self.total += us
+        if us > self.max:
+            self.max = us
+        i = 0
+        for edge in _EDGES_US:
+            if us <= edge:
+                break
+            i += 1
+        self.buckets[i] += 1
+
+    def percentile(self, p):  # Upper edge of the bucket holding percentile p
+        if not self.count:
+            return 0
+        rank = self.count * p // 100
+        seen = 0
+        for i in range(len(self.buckets)):
+            seen += self.buckets[i]
+            if seen > rank:
+                return _EDGES_US[i] if i < len(_EDGES_US) else self.max
+        return self.max
+
+    def summary(self):
+        return {
+            "n": self.count,
+            "avg": self.total // self.count if self.count else 0,
+            "p50": self.percentile(50),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+# Runtime counters and timing histograms, published as JSON to a stats topic
+# every interval and whenever a message arrives on <topic>/get.
+class Metrics:
+    def __init__(self, topic):
+        self.topic = topic
+        self.request_topic = topic + b"/get"
+        self.start = time.ticks_ms()
+        self.received = 0  # Messages received
+        self.dropped = 0  # Messages rejected or discarded
+        self.connects = 0  # Broker connections, including the first
+        self.updates = 0  # Panel updates
+        self.gc_count = 0  # Recorded by GCPolicy, as is gc_pause
+        self.parse = Histogram()
+        self.draw = Histogram()
+        self.update = Histogram()
+        self.lag = Histogram()
+        self.gc_pause = Histogram()
+        self._request = asyncio.Event()
+
+    def is_request(self, topic):  # topic may be a memoryview; compared without a copy
+        request = self.request_topic
+        if len(topic) != len(request):
+            return False
+        for k in range(len(request)):
+            if topic[k] != request[k]:
+                return False
+        return True
+
+    def request(self):  # Publish as soon as possible
+        self._request.set()
+
+    def snapshot(self):
+        return {
+            "uptime": time.ticks_diff(time.ticks_ms(), self.start) // 1000,
+            "received": self.received,
+            "dropped": self.dropped,
+            "reconnects": max(self.connects - 1, 0),
+            "updates": self.updates,
+            "mem_free": gc.mem_free(),
+            "gc_count": self.gc_count,
+            "gc_pause_us": self.gc_pause.summary(),
+            "parse_us": self.parse.summary(),
+            "draw_us": self.draw.summary(),
+            "update_us": self.update.summary(),
+            "lag_us": self.lag.summary(),
+        }
+
+    async def _probe_lag(self):  # How late the scheduler resumes a sleeping task
+        while True:
+            t = time.ticks_ms()
+            await asyncio.sleep_ms(_LAG_PERIOD_MS)
+            late = time.ticks_diff(time.ticks_ms(), t) - _LAG_PERIOD_MS
+            self.lag.add(max(late, 0) * 1000)
+
+    async def run(self, client, interval=60):
+        asyncio.create_task(self._probe_lag())
+        while True:
+            try:
+                await asyncio.wait_for(self._request.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._request.clear()
+            try:
+                await client.publish(self.topic, json.dumps(self.snapshot()))
+            except OSError:
+                pass
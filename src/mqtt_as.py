@@ -14,7 +14,7 @@ from ubinascii import hexlify
 import uasyncio as asyncio
 
 gc.collect()
-from utime import ticks_ms, ticks_diff
+from utime import ticks_ms, ticks_diff, ticks_add
 from uerrno import EINPROGRESS, ETIMEDOUT
 
 gc.collect()
@@ -24,12 +24,21 @@ import network
 
 gc.collect()
 from sys import platform
+from random import getrandbits
 
 VERSION = (0, 6, 6)
 
 # Default short delay for good SynCom throughput (avoid sleep(0) with SynCom).
 _DEFAULT_MS = const(20)
 _SOCKET_POLL_DELAY = const(5)  # 100ms added greatly to publish latency
+_READY_WAIT_MS = const(1000)  # Max idle wait in 'ready' mode before rechecking link
+
+# In-flight QoS 1 publish: [topic, msg, retain, ticks when last sent, resends]
+_TOPIC = const(0)
+_MSG = const(1)
+_RETAIN = const(2)
+_SENT = const(3)
+_COUNT = const(4)
 
 # Legitimate errors while waiting on a socket. See uasyncio __init__.py open_connection().
 ESP32 = platform == 'esp32' or platform == 'esp32_LoBo'
@@ -50,6 +59,12 @@ async def eliza(*_):  # e.g. via set_wifi_handler(coro): see test program
     await asyncio.sleep_ms(_DEFAULT_MS)
 
 
+# Park the current task on the uasyncio poller until sock is readable (or
+# writeable). Same mechanism as uasyncio Stream.read() and Stream.drain().
+def sock_ready(ioq, sock, write):
+    yield ioq.queue_write(sock) if write else ioq.queue_read(sock)
+
+
 config = {
     'client_id':     hexlify(unique_id()),
     'server':        None,
@@ -64,12 +79,19 @@ config = {
     'clean_init':    True,
     'clean':         True,
     'max_repubs':    4,
+    'max_inflight':  8,
+    'backoff_min':   500,
+    'backoff_max':   30000,
     'will':          None,
     'subs_cb':       lambda *_: None,
     'wifi_coro':     eliza,
     'connect_coro':  eliza,
     'ssid':          None,
     'wifi_pw':       None,
+    'drain_budget':  1,
+    'io_mode':       'poll',
+    'rx_buf':        1024,
+    'gc_collect':    gc.collect,
 }
 
 
@@ -84,6 +106,12 @@ def pid_gen():
         yield pid
 
 
+# Strings go on the wire as UTF-8. Length prefixes must count bytes, not
+# characters, and CPython (host simulator) has no buffer protocol for str.
+def as_bytes(s):
+    return s.encode('utf-8') if isinstance(s, str) else s
+
+
 def qos_check(qos):
     if not (qos == 0 or qos == 1):
         raise ValueError('Only qos 0 and 1 are supported.')
@@ -97,9 +125,9 @@ class MQTT_base:
 
     def __init__(self, config):
         # MQTT config
-        self._client_id = config['client_id']
-        self._user = config['user']
-        self._pswd = config['password']
+        self._client_id = as_bytes(config['client_id'])
+        self._user = as_bytes(config['user'])
+        self._pswd = as_bytes(config['password'])
         self._keepalive = config['keepalive']
         if self._keepalive >= 65536:
             raise ValueError('invalid keepalive time')
@@ -107,6 +135,7 @@ class MQTT_base:
         self._max_repubs = config['max_repubs']
         self._clean_init = config['clean_init']  # clean_session state on first connection
         self._clean = config['clean']  # clean_session state on reconnect
+        self.session_present = False  # Broker resumed a stored session (CONNACK)
         will = config['will']
         if will is None:
             self._lw_topic = False
@@ -117,10 +146,25 @@ class MQTT_base:
         self._wifi_pw = config['wifi_pw']
         self._ssl = config['ssl']
         self._ssl_params = config['ssl_params']
+        # Socket I/O: 'poll' sleeps _SOCKET_POLL_DELAY between attempts,
+        # 'ready' awaits poller readiness. Readiness of SSL sockets does not
+        # reflect data buffered in the SSL layer, so SSL always polls.
+        if config['io_mode'] not in ('poll', 'ready'):
+            raise ValueError('io_mode must be poll or ready.')
+        self._ioq = None
+        if config['io_mode'] == 'ready' and not self._ssl:
+            try:
+                from uasyncio import core
+                self._ioq = core._io_queue
+            except ImportError:  # Not uasyncio (e.g. host simulator): poll
+                pass
         # Callbacks and coros
         self._cb = config['subs_cb']
         self._wifi_handler = config['wifi_coro']
         self._connect_handler = config['connect_coro']
+        # Max packets processed per ._handle_msg() wakeup (1 == one per wakeup)
+        self._drain_budget = config['drain_budget']
+        self._gc_collect = config['gc_collect']  # Periodic collection, or None if done elsewhere
         # Network
         self.port = config['port']
         if self.port == 0:
@@ -132,8 +176,25 @@ class MQTT_base:
         self._sta_if = network.WLAN(network.STA_IF)
         self._sta_if.active(True)
 
+        # Receive buffer. Socket data is read into ._rbuf in bulk and whole
+        # packets are framed in place between ._rhead and ._rtail. Grows if a
+        # packet is larger than the buffer.
+        self._rbuf = bytearray(config['rx_buf'])
+        self._rmv = memoryview(self._rbuf)
+        self._rhead = 0
+        self._rtail = 0
+        self._pstart = 0  # Body (variable header + payload) of framed packet
+        self._pend = 0
+        self._puback = bytearray(b"\x40\x02\0\0")
+
         self.newpid = pid_gen()
         self.rcv_pids = set()  # PUBACK and SUBACK pids awaiting ACK response
+        # QoS 1 publishes awaiting PUBACK, pid -> entry (see _TOPIC). Up to
+        # max_inflight may be outstanding; each is resent when its own
+        # response_time expires.
+        self._max_inflight = max(config['max_inflight'], 1)
+        self._inflight = {}
+        self._window = asyncio.Event()  # Set when a PUBACK frees a slot
         self.last_rx = ticks_ms()  # Time of last communication from broker
         self.lock = asyncio.Lock()
 
@@ -141,8 +202,8 @@ class MQTT_base:
         qos_check(qos)
         if not topic:
             raise ValueError('Empty topic.')
-        self._lw_topic = topic
-        self._lw_msg = msg
+        self._lw_topic = as_bytes(topic)
+        self._lw_msg = as_bytes(msg)
         self._lw_qos = qos
         self._lw_retain = retain
 
@@ -153,6 +214,17 @@ class MQTT_base:
     def _timeout(self, t):
         return ticks_diff(ticks_ms(), t) > self._response_time
 
+    # Wait before retrying a socket operation which could not complete.
+    async def _io_wait(self, sock, write=False, timeout=0):
+        if self._ioq is None:
+            await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
+            return
+        try:
+            await asyncio.wait_for_ms(sock_ready(self._ioq, sock, write),
+                                      timeout or self._response_time)
+        except asyncio.TimeoutError:
+            pass  # Caller applies its own timeout
+
     async def _as_read(self, n, sock=None):  # OSError caught by superclass
         if sock is None:
             sock = self._sock
@@ -180,7 +252,9 @@ class MQTT_base:
                 size += msg_size
                 t = ticks_ms()
                 self.last_rx = ticks_ms()
-            await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
+                if self._ioq is not None:
+                    continue  # More may already be buffered: read it at once
+            await self._io_wait(sock)
         return data
 
     async def _as_write(self, bytes_wr, length=0, sock=None):
@@ -204,24 +278,83 @@ class MQTT_base:
             if n:
                 t = ticks_ms()
                 bytes_wr = bytes_wr[n:]
-            await asyncio.sleep_ms(_SOCKET_POLL_DELAY)
+                if self._ioq is not None:
+                    continue  # Send buffer may have room for the rest
+            await self._io_wait(sock, True)
 
     async def _send_str(self, s):
         await self._as_write(struct.pack("!H", len(s)))
         await self._as_write(s)
 
-    async def _recv_len(self):
+    # Read whatever the socket holds into the receive buffer in one call.
+    # Returns False if no data was available.
+    def _fill(self):
+        head = self._rhead
+        tail = self._rtail
+        if head == tail:
+            head = tail = 0
+        elif tail == len(self._rbuf):  # No room left: move partial packet to front
+            tail -= head
+            self._rbuf[:tail] = bytes(self._rmv[head:self._rtail])
+            head = 0
+        self._rhead = head
+        self._rtail = tail
+        try:
+            n = self._sock.readinto(self._rmv[tail:])  # Throws OSError on WiFi fail
+        except OSError as e:
+            if e.args[0] in BUSY_ERRORS:  # Needed by RP2
+                return False
+            raise
+        if n is None:
+            return False
+        if n == 0:
+            raise OSError(-1, 'Connection closed by host')
+        self._rtail = tail + n
+        self.last_rx = ticks_ms()
+        return True
+
+    # Frame the next complete packet in the receive buffer. Returns its first
+    # byte with ._pstart/._pend delimiting the body, or None if the buffer
+    # holds no complete packet.
+    def _frame(self):
+        buf = self._rbuf
+        head = self._rhead
+        tail = self._rtail
+        i = head + 1
         n = 0
         sh = 0
-        while 1:
-            res = await self._as_read(1)
-            b = res[0]
+        while True:  # Remaining length: variable length encoding
+            if i >= tail:
+                return None
+            b = buf[i]
+            i += 1
             n |= (b & 0x7f) << sh
             if not b & 0x80:
-                return n
+                break
             sh += 7
+            if sh > 21:
+                raise OSError(-1, 'Invalid packet length')
+        end = i + n
+        if end > tail:
+            if end - head > len(buf):
+                self._grow(end - head)
+            return None
+        self._pstart = i
+        self._pend = end
+        self._rhead = end
+        return buf[head]
+
+    def _grow(self, size):
+        n = self._rtail - self._rhead
+        buf = bytearray(size)
+        buf[:n] = self._rmv[self._rhead:self._rtail]
+        self._rbuf = buf
+        self._rmv = memoryview(buf)
+        self._rhead = 0
+        self._rtail = n
 
     async def _connect(self, clean):
+        self._rhead = self._rtail = 0  # Discard data from a previous connection
         self._sock = socket.socket()
         self._sock.setblocking(False)
         try:
@@ -271,6 +404,7 @@ class MQTT_base:
         self.dprint('Connected to broker.')  # Got CONNACK
         if resp[3] != 0 or resp[0] != 0x20 or resp[1] != 0x02:
             raise OSError(-1, 'Bad CONNACK')  # Bad CONNACK e.g. authentication fail.
+        self.session_present = bool(resp[2] & 1) and not clean
 
     async def _ping(self):
         async with self.lock:
@@ -349,28 +483,62 @@ class MQTT_base:
             return True  # PID received. All done.
         return False
 
-    # qos == 1: coro blocks until wait_msg gets correct PID.
-    # If WiFi fails completely subclass re-publishes with new PID.
+    # qos == 1: coro blocks only while max_inflight publishes await PUBACK,
+    # then returns once the packet is written. ._retransmit() resends it
+    # until wait_msg gets its PID, also after a reconnect if writing fails.
     async def publish(self, topic, msg, retain, qos):
-        pid = next(self.newpid)
-        if qos:
-            self.rcv_pids.add(pid)
-        async with self.lock:
-            await self._publish(topic, msg, retain, qos, 0, pid)
+        topic = as_bytes(topic)
+        msg = as_bytes(msg)
         if qos == 0:
+            async with self.lock:
+                await self._publish(topic, msg, retain, 0, 0, 0)
             return
-
-        count = 0
-        while 1:  # Await PUBACK, republish on timeout
-            if await self._await_pid(pid):
-                return
-            # No match
-            if count >= self._max_repubs or not self.isconnected():
-                raise OSError(-1)  # Subclass to re-publish with new PID
+        while len(self._inflight) >= self._max_inflight:
+            self._window.clear()
+            await self._window.wait()
+        pid = next(self.newpid)
+        self.rcv_pids.add(pid)
+        self._inflight[pid] = [topic, msg, retain, ticks_ms(), 0]
+        try:
             async with self.lock:
-                await self._publish(topic, msg, retain, qos, dup=1, pid=pid)  # Add pid
-            count += 1
-            self.REPUB_COUNT += 1
+                await self._publish(topic, msg, retain, qos, 0, pid)
+        except MQTTException:  # Can never be sent
+            self._acked(pid)
+            raise
+
+    def _acked(self, pid):  # Publish done with: free its window slot
+        self.rcv_pids.discard(pid)
+        if self._inflight.pop(pid, None) is not None:
+            self._window.set()
+
+    # Resend the in-flight publishes whose PUBACK is overdue. Returns the ms
+    # until the next one is due, or raises OSError if one has been resent
+    # max_repubs times or cannot be written.
+    async def _resend(self):
+        wait = self._response_time
+        now = ticks_ms()
+        due = None
+        for pid, entry in self._inflight.items():
+            left = self._response_time - ticks_diff(now, entry[_SENT])
+            if left > 0:
+                wait = min(wait, left)
+            elif due is None:
+                due = [pid]
+            else:
+                due.append(pid)
+        if due is not None:
+            for pid in due:
+                entry = self._inflight.get(pid)
+                if entry is None:  # Acknowledged meanwhile
+                    continue
+                if entry[_COUNT] >= self._max_repubs:
+                    raise OSError(-1)
+                entry[_SENT] = ticks_ms()
+                entry[_COUNT] += 1
+                self.REPUB_COUNT += 1
+                async with self.lock:
+                    await self._publish(entry[_TOPIC], entry[_MSG], entry[_RETAIN], 1, 1, pid)
+        return wait
 
     async def _publish(self, topic, msg, retain, qos, dup, pid):
         pkt = bytearray(b"\x30\0\0\0")
@@ -395,6 +563,7 @@ class MQTT_base:
 
     # Can raise OSError if WiFi fails. Subclass traps.
     async def subscribe(self, topic, qos):
+        topic = as_bytes(topic)
         pkt = bytearray(b"\x82\0\0\0")
         pid = next(self.newpid)
         self.rcv_pids.add(pid)
@@ -409,6 +578,7 @@ class MQTT_base:
 
     # Can raise OSError if WiFi fails. Subclass traps.
     async def unsubscribe(self, topic):
+        topic = as_bytes(topic)
         pkt = bytearray(b"\xa2\0\0\0")
         pid = next(self.newpid)
         self.rcv_pids.add(pid)
@@ -424,74 +594,68 @@ class MQTT_base:
     # Subscribed messages are delivered to a callback previously
     # set by .setup() method. Other (internal) MQTT
     # messages processed internally.
+    # The callback receives topic and message as memoryview slices of the
+    # receive buffer: they are only valid until the callback returns.
     # Immediate return if no data available. Called from ._handle_msg().
+    # Returns True if a packet was processed, False if none was available.
     async def wait_msg(self):
-        try:
-            res = self._sock.read(1)  # Throws OSError on WiFi fail
-        except OSError as e:
-            if e.args[0] in BUSY_ERRORS:  # Needed by RP2
-                await asyncio.sleep_ms(0)
-                return
-            raise
-        if res is None:
-            return
-        if res == b'':
-            raise OSError(-1, 'Empty response')
-
-        if res == b"\xd0":  # PINGRESP
-            await self._as_read(1)  # Update .last_rx time
-            return
-        op = res[0]
+        op = self._frame()  # A previous read may have buffered several packets
+        if op is None:
+            if not self._fill():
+                return False
+            op = self._frame()
+            if op is None:  # Partial packet: remainder arrives on a later call
+                return False
+        mv = self._rmv
+        i = self._pstart
+        end = self._pend
+
+        if op == 0xd0:  # PINGRESP: ._fill() updated .last_rx time
+            return True
 
         if op == 0x40:  # PUBACK: save pid
-            sz = await self._as_read(1)
-            if sz != b"\x02":
+            if end - i != 2:
                 raise OSError(-1, 'Invalid PUBACK packet')
-            rcv_pid = await self._as_read(2)
-            pid = rcv_pid[0] << 8 | rcv_pid[1]
+            pid = mv[i] << 8 | mv[i + 1]
             if pid in self.rcv_pids:
-                self.rcv_pids.discard(pid)
+                self._acked(pid)
             else:
                 raise OSError(-1, 'Invalid pid in PUBACK packet')
 
         if op == 0x90:  # SUBACK
-            resp = await self._as_read(4)
-            if resp[3] == 0x80:
+            if end - i != 3 or mv[i + 2] == 0x80:
                 raise OSError(-1, 'Invalid SUBACK packet')
-            pid = resp[2] | (resp[1] << 8)
+            pid = mv[i] << 8 | mv[i + 1]
             if pid in self.rcv_pids:
                 self.rcv_pids.discard(pid)
             else:
                 raise OSError(-1, 'Invalid pid in SUBACK packet')
 
         if op == 0xB0:  # UNSUBACK
-            resp = await self._as_read(3)
-            pid = resp[2] | (resp[1] << 8)
+            pid = mv[i] << 8 | mv[i + 1]
             if pid in self.rcv_pids:
                 self.rcv_pids.discard(pid)
             else:
                 raise OSError(-1)
 
         if op & 0xf0 != 0x30:
-            return
-        sz = await self._recv_len()
-        topic_len = await self._as_read(2)
-        topic_len = (topic_len[0] << 8) | topic_len[1]
-        topic = await self._as_read(topic_len)
-        sz -= topic_len + 2
+            return True
+        topic_len = mv[i] << 8 | mv[i + 1]
+        i += 2
+        topic = mv[i:i + topic_len]
+        i += topic_len
         if op & 6:
-            pid = await self._as_read(2)
-            pid = pid[0] << 8 | pid[1]
-            sz -= 2
-        msg = await self._as_read(sz)
+            pid = mv[i] << 8 | mv[i + 1]
+            i += 2
         retained = op & 0x01
-        self._cb(topic, msg, bool(retained))
+        self._cb(topic, mv[i:end], bool(retained))
         if op & 6 == 2:  # qos 1
-            pkt = bytearray(b"\x40\x02\0\0")  # Send PUBACK
+            pkt = self._puback  # Send PUBACK
             struct.pack_into("!H", pkt, 2, pid)
             await self._as_write(pkt)
         elif op & 6 == 4:  # qos 2 not supported
             raise OSError(-1, 'QoS 2 not supported')
+        return True
 
 
 # MQTTClient class. Handles issues relating to connectivity.
@@ -508,6 +672,10 @@ class MQTTClient(MQTT_base):
         self._in_connect = False
         self._has_connected = False  # Define 'Clean Session' value to use.
         self._tasks = []
+        # Reconnect attempts are spaced by exponential backoff with jitter (ms)
+        self._backoff_min = config['backoff_min']
+        self._backoff_max = config['backoff_max']
+        self._down = asyncio.Event()  # Set when the connection fails
         if ESP8266:
             import esp
             esp.sleep_type(0)  # Improve connection integrity at cost of power consumption.
@@ -593,6 +761,11 @@ class MQTTClient(MQTT_base):
             raise
         clean = self._clean if self._has_connected else self._clean_init
         self.rcv_pids.clear()
+        # Publishes not acknowledged on the old connection are resent at once
+        for pid, entry in self._inflight.items():
+            self.rcv_pids.add(pid)
+            entry[_SENT] = ticks_add(ticks_ms(), -self._response_time)
+            entry[_COUNT] = 0
         # If we get here without error broker/LAN must be up.
         self._isconnected = True
         self._in_connect = False  # Low level code can now check connectivity.
@@ -604,6 +777,7 @@ class MQTTClient(MQTT_base):
 
         asyncio.create_task(self._handle_msg())  # Task quits on connection fail.
         self._tasks.append(asyncio.create_task(self._keep_alive()))
+        self._tasks.append(asyncio.create_task(self._retransmit()))
         if self.DEBUG:
             self._tasks.append(asyncio.create_task(self._memory()))
         asyncio.create_task(self._connect_handler(self))  # User handler.
@@ -614,8 +788,18 @@ class MQTTClient(MQTT_base):
         try:
             while self.isconnected():
                 async with self.lock:
-                    await self.wait_msg()  # Immediate return if no message
-                await asyncio.sleep_ms(_DEFAULT_MS)  # Let other tasks get lock
+                    # Drain buffered packets until the socket is empty or the
+                    # budget is spent, so bursts are absorbed in one wakeup
+                    # without starving publish and ping.
+                    budget = self._drain_budget
+                    while budget and await self.wait_msg():  # False if no message
+                        budget -= 1
+                if self._ioq is None:
+                    await asyncio.sleep_ms(_DEFAULT_MS)  # Let other tasks get lock
+                elif not budget:  # Packets may remain in the receive buffer
+                    await asyncio.sleep_ms(0)
+                else:  # Sleep until data arrives; other tasks get lock meanwhile
+                    await self._io_wait(self._sock, False, _READY_WAIT_MS)
 
         except OSError:
             pass
@@ -636,6 +820,18 @@ class MQTTClient(MQTT_base):
                 break
         self._reconnect()  # Broker or WiFi fail.
 
+    # Launched by .connect(). Runs until connectivity fails. Resends
+    # unacknowledged QoS 1 publishes.
+    async def _retransmit(self):
+        while self.isconnected():
+            try:
+                wait = await self._resend()
+            except OSError:
+                self.dprint('Reconnect: no PUBACK.')
+                break
+            await asyncio.sleep_ms(wait)
+        self._reconnect()  # Broker or WiFi fail.
+
     async def _kill_tasks(self, kill_skt):  # Cancel running tasks
         for task in self._tasks:
             task.cancel()
@@ -661,6 +857,7 @@ class MQTTClient(MQTT_base):
     def _reconnect(self):  # Schedule a reconnection if not underway.
         if self._isconnected:
             self._isconnected = False
+            self._down.set()  # Wake ._keep_connected()
             asyncio.create_task(self._kill_tasks(True))  # Shut down tasks and socket
             asyncio.create_task(self._wifi_handler(False))  # User handler.
 
@@ -669,14 +866,32 @@ class MQTTClient(MQTT_base):
         while not self._isconnected:
             await asyncio.sleep(1)
 
+    # Delay before reconnect attempt n (from 0): exponential, with the upper
+    # half randomised so a fleet of clients doesn't reconnect in step.
+    def _backoff(self, n):
+        delay = min(self._backoff_min << min(n, 16), self._backoff_max)
+        return delay // 2 + getrandbits(16) % (delay // 2 + 1)
+
     # Scheduled on 1st successful connection. Runs forever maintaining wifi and
     # broker connection. Must handle conditions at edge of WiFi range.
+    # If only the broker was lost, Wi-Fi is left up and just the MQTT
+    # connection is remade, to the address resolved at the first connect.
     async def _keep_connected(self):
+        attempts = 0  # Since the connection was last up
         while self._has_connected:
-            if self.isconnected():  # Pause for 1 second
-                await asyncio.sleep(1)
-                gc.collect()
-            else:  # Link is down, socket is closed, tasks are killed
+            if self.isconnected():  # Pause for up to 1 second
+                attempts = 0
+                self._down.clear()
+                try:
+                    await asyncio.wait_for_ms(self._down.wait(), 1000)
+                except asyncio.TimeoutError:
+                    if self._gc_collect is not None:
+                        self._gc_collect()
+                continue
+            # Connection is down, socket is closed, tasks are killed
+            await asyncio.sleep_ms(self._backoff(attempts))
+            attempts += 1
+            if not self._sta_if.isconnected():  # Link loss
                 try:
                     self._sta_if.disconnect()
                 except OSError:
@@ -686,19 +901,19 @@ class MQTTClient(MQTT_base):
                     await self.wifi_connect()
                 except OSError:
                     continue
-                if not self._has_connected:  # User has issued the terminal .disconnect()
-                    self.dprint('Disconnected, exiting _keep_connected')
-                    break
-                try:
-                    await self.connect()
-                    # Now has set ._isconnected and scheduled _connect_handler().
-                    self.dprint('Reconnect OK!')
-                except OSError as e:
-                    self.dprint('Error in reconnect. %s', e)
-                    # Can get ECONNABORTED or -1. The latter signifies no or bad CONNACK received.
-                    self._close()  # Disconnect and try again.
-                    self._in_connect = False
-                    self._isconnected = False
+            if not self._has_connected:  # User has issued the terminal .disconnect()
+                self.dprint('Disconnected, exiting _keep_connected')
+                break
+            try:
+                await self.connect()
+                # Now has set ._isconnected and scheduled _connect_handler().
+                self.dprint('Reconnect OK!')
+            except OSError as e:
+                self.dprint('Error in reconnect. %s', e)
+                # Can get ECONNABORTED or -1. The latter signifies no or bad CONNACK received.
+                self._close()  # Disconnect and try again.
+                self._in_connect = False
+                self._isconnected = False
         self.dprint('Disconnected, exited _keep_connected')
 
     async def subscribe(self, topic, qos=0):
@@ -727,5 +942,7 @@ class MQTTClient(MQTT_base):
             try:
                 return await super().publish(topic, msg, retain, qos)
             except OSError:
-                pass
+                if qos:  # Queued: resent after the reconnect
+                    self._reconnect()
+                    return
             self._reconnect()  # Broker or WiFi fail.
\ No newline at end of file
@@ -0,0 +1,83 @@
+from helpers import hex_to_rgb
+
+# Named colours, name -> 0xRRGGBB. Filled by PenCache.register() and used by
+# the command parser to resolve e.g. color_fg=red.
+PALETTE = {}
+# Registered colours in registration order, addressed by index in the binary
+# protocol.
+PALETTE_INDEX = []
+_palette_names = []
+
+# Registered by the Renderer at start up, in this (index) order
+DEFAULT_PALETTE = (
+    ("black", 0x000000),
+    ("white", 0xFFFFFF),
+    ("red", 0xFF0000),
+    ("green", 0x00FF00),
+    ("blue", 0x0000FF),
+    ("yellow", 0xFFFF00),
+)
+
+
+def color_value(color):  # 0xRRGGBB int, '#rrggbb' or palette name to 0xRRGGBB
+    if isinstance(color, int):
+        return color
+    rgb = PALETTE.get(color)
+    if rgb is not None:
+        return rgb
+    r, g, b = hex_to_rgb(color)
+    return r << 16 | g << 8 | b
+
+
+# Bounded cache of PicoGraphics pens keyed on the colour as given (0xRRGGBB
+# int or colour string), so steady-state rendering neither re-parses colours
+# nor calls create_pen(). When full, the least recently used pen is evicted.
+# Registered palette colours are pinned and never evicted.
+class PenCache:
+    def __init__(self, graphics, size=16):
+        self.graphics = graphics
+        self.size = size
+        self._pens = {}  # key -> [pen, last use]
+        self._pinned = {}  # 0xRRGGBB -> pen
+        self._tick = 0
+
+    def _create(self, rgb):
+        return self.graphics.create_pen(rgb >> 16, (rgb >> 8) & 0xFF, rgb & 0xFF)
+
+    def register(self, name, color):
+        rgb = color_value(color)
+        if name in PALETTE:
+            PALETTE_INDEX[_palette_names.index(name)] = rgb
+        else:
+            _palette_names.append(name)
+            PALETTE_INDEX.append(rgb)
+        PALETTE[name] = rgb
+        pen = self._pinned.get(rgb)
+        if pen is None:
+            pen = self._create(rgb)
+            self._pinned[rgb] = pen
+        return pen
+
+    def get(self, color):
+        entry = self._pens.get(color)
+        if entry is None:
+            rgb = color_value(color)
+            pen = self._pinned.get(rgb)
+            if pen is not None:
+                return pen
+            if len(self._pens) >= self.size:
+                self._evict()
+            entry = [self._create(rgb), 0]
+            self._pens[color] = entry
+        self._tick += 1
+        entry[1] = self._tick
+        return entry[0]
+
+    def _evict(self):
+        oldest = None
+        t = self._tick + 1
+        for key, entry in self._pens.items():
+            if entry[1] < t:
+                oldest = key
+                t = entry[1]
+        del self._pens[oldest]
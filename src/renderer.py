@@ -0,0 +1,361 @@
+import uasyncio as asyncio
+import time
+
+from animate import Animator
+from command import Command, COMMANDS, OP_RECT, NO_COLOR, VALIGN_MASK, VALIGN_MIDDLE
+from displaylist import DisplayLists
+from frame import FrameDecoder
+from layout import LayoutCache, FONT_HEIGHTS
+from pens import PenCache, DEFAULT_PALETTE
+from sprites import SpriteCache
+from widgets import Widgets
+
+DEFAULT_FONT = "bitmap8"
+MAX_CALL_DEPTH = 4  # Nested display list calls
+
+
+# Executes Commands against the framebuffer and decouples drawing from panel
+# updates. Drawing records the damaged region; the .run() task pushes the
+# framebuffer to the panel at most once per frame tick, so N commands arriving
+# within one tick cost a single update().
+#
+# A small scene list remembers recent rect/text commands in draw order. A
+# command identical to a remembered one, with nothing drawn over that one
+# since, would not change any pixel and is skipped.
+#
+# Command coordinates are relative to .ox, .oy: display list calls and layers
+# translate their commands without modifying them.
+#
+# With a Metrics instance, panel updates are counted and timed.
+class Renderer:
+    def __init__(self, i75, fps=30, pen_cache_size=16, scene_size=32, metrics=None):
+        self.i75 = i75
+        self.metrics = metrics
+        self.graphics = i75.display
+        self.width = i75.width
+        self.height = i75.height
+        self.frame_ms = 1000 // fps
+        self.pens = PenCache(self.graphics, pen_cache_size)
+        for name, rgb in DEFAULT_PALETTE:
+            self.pens.register(name, rgb)
+        self.frames = FrameDecoder(self.graphics, self.width, self.height)
+        self.layouts = LayoutCache(self)
+        self.lists = DisplayLists()
+        self.sprites = SpriteCache()
+        self.anims = Animator(self)
+        self.widgets = Widgets(self)
+        self.layers = None  # Compositor, if any
+        self.graphics.set_font(DEFAULT_FONT)
+        self.graphics.set_pen(self.pens.get(0x000000))
+        self.font = DEFAULT_FONT  # Current graphics state
+        self.fg = 0x000000
+        self.dirty = False
+        self.x0 = self.y0 = self.x1 = self.y1 = 0  # Damaged region since last flush
+        self._scene = [Command() for _ in range(scene_size)]
+        self._bounds = [0] * (4 * scene_size)
+        self._scene_len = 0
+        self.clipped = False  # Drawing is clipped: scene list not used
+        self.cx0 = self.cy0 = 0  # Clip rect, within the panel
+        self.cx1 = self.width
+        self.cy1 = self.height
+        self.ox = self.oy = 0  # Origin
+        self._depth = 0  # Display list call depth
+
+    # Add a rect to the damaged region (the whole panel if no args).
+    def invalidate(self, x=0, y=0, w=-1, h=-1):
+        if w < 0:
+            w = self.width
+            h = self.height
+        x1 = x + w
+        y1 = y + h
+        if not self.dirty:
+            self.dirty = True
+            self.x0, self.y0, self.x1, self.y1 = x, y, x1, y1
+            return
+        if x < self.x0:
+            self.x0 = x
+        if y < self.y0:
+            self.y0 = y
+        if x1 > self.x1:
+            self.x1 = x1
+        if y1 > self.y1:
+            self.y1 = y1
+
+    # Restrict drawing to a rect (x, y, w, h), or remove the restriction if
+    # no args. Clipped draws neither skip nor are remembered in the scene
+    # list, as they may not cover what they would unclipped.
+    def clip(self, x=0, y=0, w=-1, h=-1):
+        if w < 0:
+            self.graphics.remove_clip()
+            self.clipped = False
+            self.cx0 = self.cy0 = 0
+            self.cx1 = self.width
+            self.cy1 = self.height
+        else:
+            self.graphics.set_clip(x, y, w, h)
+            self.clipped = True
+            self.cx0 = max(x, 0)
+            self.cy0 = max(y, 0)
+            self.cx1 = min(x + w, self.width)
+            self.cy1 = min(y + h, self.height)
+
+    # Fill a rect with a colour, by default the background.
+    def fill(self, x, y, w, h, color=0x000000):
+        if self.fg != color:
+            self.graphics.set_pen(self.pens.get(color))
+            self.fg = color
+        self.graphics.rectangle(x, y, w, h)
+        self._forget(x, y, x + w, y + h, True)
+        self.invalidate(x, y, w, h)
+
+    def flush(self):
+        if not self.dirty:
+            return False
+        self.dirty = False
+        metrics = self.metrics
+        if metrics is None:
+            self.push(self.x0, self.y0, self.x1 - self.x0, self.y1 - self.y0)
+            return True
+        t = time.ticks_us()
+        self.push(self.x0, self.y0, self.x1 - self.x0, self.y1 - self.y0)
+        metrics.update.add(time.ticks_diff(time.ticks_us(), t))
+        metrics.updates += 1
+        return True
+
+    # Send the framebuffer to the panel. x, y, w, h bound everything drawn
+    # since the last push; Interstate75 can only update the whole panel but
+    # subclasses for other drivers may use them.
+    def push(self, x, y, w, h):
+        self.i75.update(self.graphics)
+
+    # Render task. drain, if given, is called before each flush to draw
+    # pending input (e.g. Dispatcher.drain). gc, if given (a GCPolicy), may
+    # collect in the time left after the flush. Errors are printed and the
+    # task carries on with the next frame.
+    async def run(self, drain=None, gc=None):
+        while True:
+            t = time.ticks_ms()
+            try:
+                if drain is not None:
+                    drain()
+                self.anims.tick()
+                self.widgets.tick()
+                self.flush()
+            except Exception as e:
+                print("Error: Render task:", repr(e))
+            if gc is not None:
+                gc.idle(self.frame_ms - time.ticks_diff(time.ticks_ms(), t))
+            elapsed = time.ticks_diff(time.ticks_ms(), t)
+            await asyncio.sleep_ms(max(0, self.frame_ms - elapsed))
+
+    # Draw one Command, with the draw handler registered for it (see
+    # command.register()). Returns False if it was skipped or invalid.
+    def draw(self, cmd):
+        t = COMMANDS[cmd.op]
+        if t.draw is None:
+            if t.receive is not None:  # Only handled leading a message
+                print("Error: Command '%s' must come first." % t.name.decode())
+            return False  # Not drawn (layer)
+        return t.draw(self, cmd, cmd.x + self.ox, cmd.y + self.oy)
+
+    def draw_clear(self):  # Clear the panel and what was drawn on it
+        graphics = self.graphics
+        graphics.set_pen(self.pens.get(0x000000))
+        self.fg = 0x000000
+        graphics.clear()
+        self.anims.stop_all()
+        self.widgets.clear()
+        if self.layers is not None:
+            self.layers.forget()
+        self._scene_len = 0
+        self.invalidate()
+        return True
+
+    def draw_frame(self, cmd, x, y):
+        if not self.frames.draw(cmd, x, y):
+            return False
+        self._forget(x, y, x + cmd.w, y + cmd.h, True)
+        self.invalidate(x, y, cmd.w, cmd.h)
+        return True
+
+    def draw_shape(self, cmd, x, y):  # rect, text
+        op = cmd.op
+        graphics = self.graphics
+        fg = self.fg if cmd.fg == NO_COLOR else cmd.fg
+        font = self.font if cmd.font is None else cmd.font
+        o = 0 if cmd.color_outline == NO_COLOR else cmd.outline
+        if op == OP_RECT:
+            if o > 0 and cmd.fg == NO_COLOR:
+                fg = NO_COLOR  # Border only
+            x0 = x
+            y0 = y
+            x1 = x0 + cmd.w
+            y1 = y0 + cmd.h
+        else:
+            if font != self.font:
+                graphics.set_font(font)
+                self.font = font
+            lay = self.layouts.get(cmd.content, cmd.scale, cmd.w, cmd.flow)
+            ty = y
+            if cmd.h > 0 and cmd.flow & VALIGN_MASK:
+                ty += (cmd.h - lay.height) // (2 if cmd.flow & VALIGN_MIDDLE else 1)
+            x0 = x + lay.left - o
+            y0 = ty - o
+            x1 = x + lay.right + o
+            y1 = ty + lay.height + o
+        # Clip to the panel
+        x0 = max(x0, 0)
+        y0 = max(y0, 0)
+        x1 = min(x1, self.width)
+        y1 = min(y1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return False  # Nothing visible
+
+        clipped = self.clipped
+        if not clipped and self._unchanged(cmd, x, y, fg, font, x0, y0, x1, y1):
+            return False
+
+        if op == OP_RECT:
+            if o > 0:  # Border inside the rect, filled only if color_fg is set
+                self._border(x, y, cmd.w, cmd.h, o, cmd.color_outline)
+                if fg != NO_COLOR:
+                    self._pen(fg)
+                    graphics.rectangle(x + o, y + o, cmd.w - 2 * o, cmd.h - 2 * o)
+                    self._forget(x0, y0, x1, y1)  # Opaque: hides what it covers
+            else:
+                self._pen(fg)
+                graphics.rectangle(x, y, cmd.w, cmd.h)
+                self._forget(x0, y0, x1, y1)
+        else:
+            if o > 0:
+                self.layouts.outline(lay, o, x, ty, cmd.color_outline)
+            self._pen(fg)
+            self.layouts.text(lay, x, ty)
+        if not clipped:
+            self._remember(cmd, x, y, fg, font, x0, y0, x1, y1)
+        self.invalidate(x0, y0, x1 - x0, y1 - y0)
+        return True
+
+    def _pen(self, color):
+        if color != self.fg:
+            self.graphics.set_pen(self.pens.get(color))
+            self.fg = color
+
+    def _border(self, x, y, w, h, size, color):
+        self._pen(color)
+        graphics = self.graphics  # Method calls: no bound method is allocated
+        graphics.rectangle(x, y, w, size)
+        graphics.rectangle(x, y + h - size, w, size)
+        graphics.rectangle(x, y + size, size, h - 2 * size)
+        graphics.rectangle(x + w - size, y + size, size, h - 2 * size)
+
+    def text_height(self, text, scale=1):  # In the current font
+        return FONT_HEIGHTS.get(self.font, 16) * scale * (text.count("\n") + 1)
+
+    def draw_blit(self, cmd, x, y):  # Draw a sprite at x, y
+        sprite = self.sprites.get(cmd.sprite)
+        if sprite is None:
+            print("Error: Unknown sprite", cmd.sprite)
+            return False
+        x0 = max(x, self.cx0)
+        y0 = max(y, self.cy0)
+        x1 = min(x + sprite.w, self.cx1)
+        y1 = min(y + sprite.h, self.cy1)
+        if x0 >= x1 or y0 >= y1:
+            return False  # Nothing visible
+        if not self.frames.blit(sprite, x, y, x0, y0, x1, y1):
+            return False
+        self._forget(x0, y0, x1, y1, True)  # May be transparent: not opaque
+        self.invalidate(x0, y0, x1 - x0, y1 - y0)
+        return True
+
+    def draw_call(self, cmd, x, y):  # Draw a display list with its origin at x, y
+        commands = self.lists.get(cmd.content)
+        if commands is None or self._depth >= MAX_CALL_DEPTH:
+            return False
+        ox = self.ox
+        oy = self.oy
+        self.ox = x
+        self.oy = y
+        self._depth += 1
+        try:
+            for c in commands:
+                self.draw(c)
+        finally:
+            self._depth -= 1
+            self.ox = ox
+            self.oy = oy
+        return True
+
+    def _unchanged(self, cmd, x, y, fg, font, x0, y0, x1, y1):
+        bounds = self._bounds
+        for i in range(self._scene_len - 1, -1, -1):  # Newest first
+            rec = self._scene[i]
+            if (rec.op == cmd.op and rec.x == x and rec.y == y
+                    and rec.w == cmd.w and rec.h == cmd.h and rec.fg == fg
+                    and rec.font == font and rec.scale == cmd.scale
+                    and rec.content == cmd.content and rec.flow == cmd.flow
+                    and rec.outline == cmd.outline
+                    and rec.color_outline == cmd.color_outline):
+                return True
+            b = i * 4
+            if bounds[b] < x1 and x0 < bounds[b + 2] and bounds[b + 1] < y1 and y0 < bounds[b + 3]:
+                return False  # Drawn over since: must redraw
+        return False
+
+    def _remember(self, cmd, x, y, fg, font, x0, y0, x1, y1):
+        scene = self._scene
+        n = self._scene_len
+        bounds = self._bounds
+        if n == len(scene):  # Full: drop the oldest, reusing its record
+            rec = scene[0]
+            n -= 1
+            for i in range(n):
+                scene[i] = scene[i + 1]
+            for i in range(4 * n):
+                bounds[i] = bounds[i + 4]
+            scene[n] = rec
+        else:
+            rec = scene[n]
+        rec.op = cmd.op
+        rec.x = x
+        rec.y = y
+        rec.w = cmd.w
+        rec.h = cmd.h
+        rec.fg = fg
+        rec.font = font
+        rec.scale = cmd.scale
+        rec.content = cmd.content
+        rec.flow = cmd.flow
+        rec.outline = cmd.outline
+        rec.color_outline = cmd.color_outline
+        b = n * 4
+        bounds[b] = x0
+        bounds[b + 1] = y0
+        bounds[b + 2] = x1
+        bounds[b + 3] = y1
+        self._scene_len = n + 1
+
+    # Drop entries inside the rect, or if overlapping is set, touching it.
+    def _forget(self, x0, y0, x1, y1, overlapping=False):
+        scene = self._scene
+        bounds = self._bounds
+        j = 0
+        for i in range(self._scene_len):
+            b = i * 4
+            if overlapping:
+                hit = bounds[b] < x1 and x0 < bounds[b + 2] and bounds[b + 1] < y1 and y0 < bounds[b + 3]
+            else:
+                hit = (x0 <= bounds[b] and y0 <= bounds[b + 1]
+                       and bounds[b + 2] <= x1 and bounds[b + 3] <= y1)
+            if not hit:
+                if i != j:
+                    scene[i], scene[j] = scene[j], scene[i]
+                    c = j * 4
+                    bounds[c] = bounds[b]
+                    bounds[c + 1] = bounds[b + 1]
+                    bounds[c + 2] = bounds[b + 2]
+                    bounds[c + 3] = bounds[b + 3]
+                j += 1
+        self._scene_len = j
+
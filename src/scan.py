@@ -0,0 +1,128 @@
+# Byte scanning for the text parser (command.py), on bytes, bytearray or
+# memoryview alike, without slicing.
+#
+# On the device these are viper loops: the parser runs on the inbox's
+# bytearray buffers, and MicroPython's bytearray and memoryview have no
+# find() or startswith(), so plain Python loops over them would cost more
+# than the rest of the parse. Without the micropython module (host tools on
+# CPython) the search methods of bytes and bytearray are used instead.
+try:
+    import micropython
+except ImportError:
+    micropython = None
+
+if micropython is not None:
+
+    # First non-whitespace in buf[i:end], or end
+    @micropython.viper
+    def skip_space(buf: ptr8, i: int, end: int) -> int:
+        while i < end and buf[i] <= 32:
+            i += 1
+        return i
+
+    # Tokens are separated by any ASCII whitespace
+    @micropython.viper
+    def token_end(buf: ptr8, i: int, end: int) -> int:
+        while i < end and buf[i] > 32:
+            i += 1
+        return i
+
+    # Start of the last token in buf[i:end]
+    @micropython.viper
+    def token_start(buf: ptr8, i: int, end: int) -> int:
+        while end > i and buf[end - 1] > 32:
+            end -= 1
+        return end
+
+    # end less trailing whitespace
+    @micropython.viper
+    def trim_end(buf: ptr8, i: int, end: int) -> int:
+        while end > i and buf[end - 1] <= 32:
+            end -= 1
+        return end
+
+    # Index of sep[0] in buf[i:end], or end
+    @micropython.viper
+    def find(buf: ptr8, sep: ptr8, i: int, end: int) -> int:
+        c = sep[0]
+        while i < end and buf[i] != c:
+            i += 1
+        return i
+
+    # Case insensitive buf[i:j] == word
+    @micropython.viper
+    def equals(buf: ptr8, i: int, j: int, word) -> bool:
+        n = int(len(word))
+        if j - i != n:
+            return False
+        w = ptr8(word)
+        for k in range(n):
+            c = buf[i + k]
+            if c >= 65 and c <= 90:
+                c += 32
+            if c != w[k]:
+                return False
+        return True
+
+    # Case sensitive buf[i:j] == raw
+    @micropython.viper
+    def same(buf: ptr8, i: int, j: int, raw) -> bool:
+        n = int(len(raw))
+        if j - i != n:
+            return False
+        r = ptr8(raw)
+        for k in range(n):
+            if buf[i + k] != r[k]:
+                return False
+        return True
+
+else:
+
+    def skip_space(buf, i, end):
+        while i < end and buf[i] <= 32:
+            i += 1
+        return i
+
+    def token_end(buf, i, end):
+        while i < end and buf[i] > 32:
+            i += 1
+        return i
+
+    def token_start(buf, i, end):
+        while end > i and buf[end - 1] > 32:
+            end -= 1
+        return end
+
+    def trim_end(buf, i, end):
+        while end > i and buf[end - 1] <= 32:
+            end -= 1
+        return end
+
+    def find(buf, sep, i, end):
+        if type(buf) is memoryview:  # No find(): search what it views
+            buf = buf.obj if buf.nbytes == len(buf.obj) else bytes(buf)
+        i = buf.find(sep, i, end)
+        return end if i < 0 else i
+
+    def equals(buf, i, j, word):
+        if j - i != len(word):
+            return False
+        if type(buf) is not memoryview and buf.startswith(word, i):
+            return True
+        for k in range(j - i):
+            c = buf[i + k]
+            if 65 <= c <= 90:
+                c += 32
+            if c != word[k]:
+                return False
+        return True
+
+    def same(buf, i, j, raw):
+        if j - i != len(raw):
+            return False
+        if type(buf) is not memoryview:
+            return buf.startswith(raw, i)
+        for k in range(j - i):
+            if buf[i + k] != raw[k]:
+                return False
+        return True
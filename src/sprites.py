@@ -0,0 +1,126 @@
+import os
+import struct
+
+# Sprites (see "sprite" and "blit" in PROTOCOL.md).
+#
+# A sprite is uploaded once, in `sprite` chunks addressed by id and byte
+# offset, and kept encoded (as a frame's pixel data: RGB565, RGB888 or palette
+# indices, raw or run-length) so `blit` decodes it straight into the
+# framebuffer. Run-length skip tokens are transparent.
+#
+# Sprites are held in RAM up to max_bytes, evicting the least recently
+# blitted. With a directory set by .open(), each complete sprite is also
+# written to flash, so one evicted from RAM, or lost to a reboot, is
+# reloaded on its next blit instead of having to be uploaded again.
+
+_HEADER = "<hhB"  # Flash file: width, height, format, then the data
+_HEADER_SIZE = struct.calcsize(_HEADER)
+
+
+class Sprite:
+    __slots__ = ("id", "w", "h", "fmt", "data", "received", "stamp")
+
+    def __init__(self, id, w, h, fmt, data):
+        self.id = id
+        self.w = w
+        self.h = h
+        self.fmt = fmt  # Pixel format << 4 | encoding, as Command.fmt
+        self.data = data
+        self.received = len(data)  # Bytes uploaded, from the start
+        self.stamp = 0  # Last use
+
+
+class SpriteCache:
+    def __init__(self, max_bytes=32768):
+        self.max_bytes = max_bytes
+        self.path = None
+        self._sprites = {}  # id -> Sprite
+        self._bytes = 0
+        self._tick = 0
+
+    # Keep complete sprites in directory path, and reload them from there.
+    def open(self, path):
+        self.path = path
+        try:
+            os.mkdir(path)
+        except OSError:
+            pass  # Exists
+
+    # Store an OP_SPRITE chunk. The chunk at offset 0 starts a new upload,
+    # replacing any sprite with that id; later chunks must follow on (a
+    # repeated chunk is harmless). Returns False after printing an error.
+    def load(self, cmd):
+        id = cmd.sprite
+        offset = cmd.offset
+        if offset == 0:
+            size = cmd.size or len(cmd.data)  # Default: all in this chunk
+            if cmd.w <= 0 or cmd.h <= 0 or not 0 < size <= self.max_bytes:
+                print("Error: Invalid sprite size.")
+                return False
+            old = self._sprites.pop(id, None)
+            if old is not None:
+                self._bytes -= len(old.data)
+            sprite = self._add(Sprite(id, cmd.w, cmd.h, cmd.fmt, bytearray(size)))
+            sprite.received = 0
+        else:
+            sprite = self._sprites.get(id)
+        end = offset + len(cmd.data)
+        if sprite is None or offset > sprite.received or end > len(sprite.data):
+            print("Error: Sprite chunk out of order.")
+            return False
+        sprite.data[offset:end] = cmd.data
+        if end > sprite.received:
+            sprite.received = end
+            if end == len(sprite.data) and self.path:
+                self._save(sprite)
+        return True
+
+    def get(self, id):  # Complete Sprite, or None
+        sprite = self._sprites.get(id)
+        if sprite is None and self.path:
+            sprite = self._read(id)
+        if sprite is None or sprite.received < len(sprite.data):
+            return None
+        self._tick += 1
+        sprite.stamp = self._tick
+        return sprite
+
+    def _add(self, sprite):  # Evicting least recently used sprites to fit it
+        size = len(sprite.data)
+        while self._sprites and self._bytes + size > self.max_bytes:
+            oldest = None
+            for other in self._sprites.values():
+                if oldest is None or other.stamp < oldest.stamp:
+                    oldest = other
+            del self._sprites[oldest.id]
+            self._bytes -= len(oldest.data)
+        self._sprites[sprite.id] = sprite
+        self._bytes += size
+        self._tick += 1
+        sprite.stamp = self._tick
+        return sprite
+
+    def _save(self, sprite):
+        file = self.path + "/" + str(sprite.id)
+        header = struct.pack(_HEADER, sprite.w, sprite.h, sprite.fmt)
+        try:
+            with open(file, "rb") as f:
+                if f.read(_HEADER_SIZE) == header and f.read() == sprite.data:
+                    return  # Unchanged: spare the flash
+        except OSError:
+            pass
+        with open(file, "wb") as f:
+            f.write(header)
+            f.write(sprite.data)
+
+    def _read(self, id):
+        try:
+            with open(self.path + "/" + str(id), "rb") as f:
+                header = f.read(_HEADER_SIZE)
+                data = f.read()
+        except OSError:
+            return None  # Not saved
+        if len(header) < _HEADER_SIZE or not 0 < len(data) <= self.max_bytes:
+            return None
+        w, h, fmt = struct.unpack(_HEADER, header)
+        return self._add(Sprite(id, w, h, fmt, bytearray(data)))  # A late chunk may still write
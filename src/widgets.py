@@ -0,0 +1,228 @@
+import time
+
+from command import Command, OP_TEXT, NO_COLOR
+
+# Text widgets filled in on the device (see "widget" in PROTOCOL.md).
+#
+# A widget's template is split once into literal text and fields:
+#
+#   {name}      variable, set by `set` and `add` commands
+#   {%H:%M}     local time, strftime-like (see _strftime)
+#   {uptime}    time since boot, [Nd ]HH:MM:SS
+#
+# A widget is re-rendered, into its own rect only, when a variable it uses
+# changes or, if it shows the time, when the second changes, and then only
+# redrawn if the resulting text differs from what it shows.
+
+_VAR = 0
+_TIME = 1
+_UPTIME = 2
+
+_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def _strftime(fmt, t):  # t: time.localtime() tuple
+    out = []
+    i = 0
+    n = len(fmt)
+    while i < n:
+        c = fmt[i]
+        if c != "%" or i + 1 == n:
+            out.append(c)
+            i += 1
+            continue
+        c = fmt[i + 1]
+        i += 2
+        if c == "Y":
+            out.append(str(t[0]))
+        elif c == "y":
+            out.append("%02d" % (t[0] % 100))
+        elif c == "m":
+            out.append("%02d" % t[1])
+        elif c == "d":
+            out.append("%02d" % t[2])
+        elif c == "H":
+            out.append("%02d" % t[3])
+        elif c == "I":
+            out.append("%02d" % ((t[3] + 11) % 12 + 1))
+        elif c == "p":
+            out.append("AM" if t[3] < 12 else "PM")
+        elif c == "M":
+            out.append("%02d" % t[4])
+        elif c == "S":
+            out.append("%02d" % t[5])
+        elif c == "a":
+            out.append(_DAYS[t[6]])
+        elif c == "b":
+            out.append(_MONTHS[t[1] - 1])
+        else:  # Including %%
+            out.append(c)
+    return "".join(out)
+
+
+def _compile(template):  # Template to a list of str and (kind, arg) fields
+    parts = []
+    i = 0
+    while True:
+        j = template.find("{", i)
+        k = template.find("}", j + 1) if j >= 0 else -1
+        if k < 0:
+            break
+        if j > i:
+            parts.append(template[i:j])
+        field = template[j + 1:k]
+        if field.startswith("%"):
+            parts.append((_TIME, field))
+        elif field == "uptime":
+            parts.append((_UPTIME, None))
+        else:
+            parts.append((_VAR, field))
+        i = k + 1
+    if i < len(template):
+        parts.append(template[i:])
+    return parts
+
+
+class Widget:
+    __slots__ = ("cmd", "ox", "oy", "active", "parts", "timed", "text", "dirty")
+
+    def __init__(self):
+        self.cmd = Command()
+        self.ox = self.oy = 0  # Origin the command was drawn with
+        self.active = False
+        self.parts = None
+        self.timed = False  # Shows the time or uptime
+        self.text = None  # What is shown
+        self.dirty = False
+
+
+class Widgets:
+    def __init__(self, renderer, size=8, max_vars=32, utc_offset=0):
+        self.renderer = renderer
+        self.max_vars = max_vars
+        self.utc_offset = utc_offset  # Seconds added to the RTC time for {%...}
+        self.vars = {}
+        self._pool = [Widget() for _ in range(size)]
+        self._item = Command()
+        self._item.reset(OP_TEXT)
+        self._second = -1
+        self._uptime = 0  # ms, accumulated so ticks_ms() wrapping doesn't matter
+        self._last = time.ticks_ms()
+
+    # Place a widget (OP_WIDGET) drawn with origin ox, oy, replacing any
+    # other whose rect starts at the same point. Returns False if the pool is
+    # full.
+    def place(self, cmd, ox, oy):
+        x = cmd.x + ox
+        y = cmd.y + oy
+        free = None
+        for w in self._pool:
+            if w.active and w.cmd.x + w.ox == x and w.cmd.y + w.oy == y:
+                if w.ox == ox and w.oy == oy and w.cmd.equals(cmd):
+                    w.text = None  # Same widget: just repaint
+                    w.dirty = True
+                    return True
+                free = w
+                break
+            if free is None and not w.active:
+                free = w
+        if free is None:
+            print("Error: Too many widgets.")
+            return False
+        w = free
+        w.cmd.copy(cmd)
+        w.ox = ox
+        w.oy = oy
+        w.parts = _compile(cmd.content or "")
+        w.timed = False
+        for p in w.parts:
+            if type(p) is tuple and p[0] != _VAR:
+                w.timed = True
+        w.text = None
+        w.dirty = True
+        w.active = True
+        return True
+
+    def set(self, name, value):
+        vars = self.vars
+        if name not in vars and len(vars) >= self.max_vars:
+            print("Error: Too many variables.")
+            return
+        if vars.get(name) == value:
+            return
+        vars[name] = value
+        for w in self._pool:
+            if w.active and not w.dirty:
+                for p in w.parts:
+                    if type(p) is tuple and p[0] == _VAR and p[1] == name:
+                        w.dirty = True
+                        break
+
+    def add(self, name, amount):  # Counter; non-numeric values count from 0
+        try:
+            v = int(self.vars.get(name, 0))
+        except ValueError:
+            v = 0
+        self.set(name, str(v + amount))
+
+    def clear(self):  # Remove all widgets; variables are kept
+        for w in self._pool:
+            w.active = False
+
+    def tick(self):
+        now = time.ticks_ms()
+        self._uptime += time.ticks_diff(now, self._last)
+        self._last = now
+        second = int(time.time())
+        if second != self._second:
+            self._second = second
+            for w in self._pool:
+                if w.timed:
+                    w.dirty = True
+        for w in self._pool:
+            if w.active and w.dirty:
+                w.dirty = False
+                self._render(w)
+
+    def _render(self, w):
+        local = None
+        out = []
+        for p in w.parts:
+            if type(p) is str:
+                out.append(p)
+            elif p[0] == _VAR:
+                out.append(self.vars.get(p[1], ""))
+            elif p[0] == _TIME:
+                if local is None:
+                    local = time.localtime(self._second + self.utc_offset)
+                out.append(_strftime(p[1], local))
+            else:
+                s = self._uptime // 1000
+                d = s // 86400
+                out.append("%s%02d:%02d:%02d" % (
+                    "%dd " % d if d else "", s // 3600 % 24, s // 60 % 60, s % 60))
+        text = "".join(out)
+        if text == w.text:
+            return  # Nothing visible changed
+        w.text = text
+        cmd = w.cmd
+        r = self.renderer
+        x = cmd.x + w.ox
+        y = cmd.y + w.oy
+        r.fill(x, y, cmd.w, cmd.h, 0x000000 if cmd.bg == NO_COLOR else cmd.bg)
+        item = self._item
+        item.x = x
+        item.y = y
+        item.fg = cmd.fg
+        item.scale = cmd.scale
+        item.font = cmd.font
+        item.w = cmd.w
+        item.h = cmd.h
+        item.flow = cmd.flow
+        item.outline = cmd.outline
+        item.color_outline = cmd.color_outline
+        item.content = text
+        r.clip(x, y, cmd.w, cmd.h)
+        r.draw(item)
+        r.clip()
@@ -10,18 +10,13 @@ mqtt_pub "display rect 2 2 124 60 color_fg=#000000"
 
 while true; do
 
-  mqtt_pub "display rect 2 2 124 60 color_fg=#000000"
-  
-  mqtt_pub "display text 8 4 0 0 color_fg=#ffff00 Date"
-  mqtt_pub "display text 8 12 0 0 color_fg=#ffffff,scale=2 $(date +%D)"
+  # Send the whole refresh as one batch so it is drawn as a single frame
+  mqtt_pub "display rect 2 2 124 60 color_fg=#000000
+display text 8 4 0 0 color_fg=#ffff00 Date
+display text 8 12 0 0 color_fg=#ffffff,scale=2 $(date +%D)
+display text 8 28 0 0 color_fg=#ffff00 Time
+display text 8 36 0 0 color_fg=#ffffff,scale=2 $(date +%T)"
 
-  mqtt_pub "display text 8 28 0 0 color_fg=#ffff00 Time"
-  mqtt_pub "display text 8 36 0 0 color_fg=#ffffff,scale=2 $(date +%T)"
-
-  
-
-
-  
   sleep 10
 
 done
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "sim"))
+sys.path.insert(0, os.path.join(ROOT, "tools"))  # Host encoders
+
+from simulator import install  # noqa: E402
+
+install()  # src/ and the device stand-ins, before any client module is imported
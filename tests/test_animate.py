@@ -0,0 +1,41 @@
+import time
+
+import pytest
+
+from simulator import Simulator
+
+
+@pytest.mark.parametrize("message", [
+    "display animate marquee 0 0 0 8 color_fg=#ffffff",
+    "display animate vmarquee 0 0 8 0 color_fg=#ffffff",
+    "display animate blink 0 0 -4 8 color_fg=#ffffff",
+])
+def test_empty_viewport_rejected(message, capsys):
+    sim = Simulator()
+    sim.publish(message)
+    assert "Animation needs a viewport" in capsys.readouterr().out
+    time.sleep(0.01)
+    sim.renderer.anims.tick()  # Must not raise
+    assert not any(a.active for a in sim.renderer.anims._pool)
+
+
+def test_marquee_scrolls():
+    sim = Simulator()
+    sim.publish("display animate marquee 0 0 32 8 color_fg=#ffffff,period=1 Hi")
+    sim.renderer.anims.tick()
+    assert any(a.active for a in sim.renderer.anims._pool)
+
+
+@pytest.mark.parametrize("rect", ["0 0 0 0", "0 0 4 4"])
+def test_tween_leaves_no_trail(rect):
+    # The rect is empty, or smaller than the text: all of the text is erased
+    sim = Simulator()
+    sim.publish(f"display animate tween {rect} color_fg=#ffffff,dx=30,period=20 Hi")
+    sim.renderer.anims.tick()
+    assert sim.image()[:, :20].any()
+    time.sleep(0.03)
+    sim.renderer.anims.tick()
+    assert not any(a.active for a in sim.renderer.anims._pool)
+    image = sim.image()
+    assert not image[:, :30].any()
+    assert image[:, 30:].any()
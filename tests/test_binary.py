@@ -0,0 +1,112 @@
+import pytest
+
+from binary import MAGIC, VERSION, parse_binary, rgb565_to_rgb, rgb_to_rgb565
+from binary_encoder import DEVICE_PALETTE, _layout, encode
+from command import NO_COLOR, OP_CALL, OP_DEFINE, OP_SET, OP_TEXT, CommandPool, parse_batch
+from simulator import Simulator
+
+
+def payload(*parts):
+    return bytes([MAGIC, VERSION]) + b"".join(parts)
+
+
+def rejected(data, capsys):
+    assert parse_binary(data) is None
+    return "Truncated name" in capsys.readouterr().out
+
+
+def test_name():
+    batch = parse_binary(payload(bytes([OP_DEFINE, 6]), b"chrome"))
+    assert batch[0].op == OP_DEFINE and batch[0].content == "chrome"
+
+
+def test_truncated_define_name(capsys):
+    assert rejected(payload(bytes([OP_DEFINE, 6]), b"chr"), capsys)
+
+
+def test_truncated_call_name(capsys):
+    assert rejected(payload(bytes([OP_CALL, 0, 0, 0, 0, 6]), b"chr"), capsys)
+
+
+def test_truncated_set_name(capsys):
+    assert rejected(payload(bytes([OP_SET, 4]), b"va"), capsys)
+
+
+def test_truncated_font_name(capsys):
+    header = bytes([OP_TEXT | 0x80, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 7])
+    assert rejected(payload(header, b"bitm"), capsys)
+
+
+# Every command the encoder handles, decoded by the device decoder, must
+# match the text parser's Command
+CORPUS = """\
+display layer 0 0 128 16 z=2,layer=clock
+display layer 0 16 128 48
+display define chrome
+display call chrome
+display call chrome 4 -2
+display animate marquee 0 0 64 8 color_fg=yellow,speed=25 Breaking news
+display animate fade 0 8 8 8 color_fg=red,color_to=#101010,period=2000
+display animate tween 0 0 16 8 dx=48,dy=-4,font=bitmap6 ->
+display widget 0 0 64 8 color_fg=white {%H:%M:%S} up {uptime}
+display set temp 21.5 °C
+display add visitors -3
+display clear
+display rect 0 0 128 64 color_fg=#0000cc
+display rect 2 2 124 60 color_fg=#000000
+display rect -4 -4 8 8 color_fg=#123456,color_bg=#fedcba
+display rect 10 10 20 20 color_fg=red
+display text 8 4 0 0 color_fg=#ffff00 Date
+display text 8 12 0 0 color_fg=#ffffff,scale=2 01/01/25
+display text 8 36 0 0 color_fg=#ffffff,scale=2 12:34:56
+display text 0 0 128 8 font=bitmap8,color_fg=#ff8000 Temp 21°C
+display text 1 2 3 4 multiple   spaces kept
+display text 0 0 128 32 align=center,valign=middle,wrap=true,font_num=1 Wrapped and centred
+display text 0 0 64 16 outline=1,color_outline=black,color_fg=white Outlined
+display rect 0 0 128 64 outline=2,color_outline=#ff0000
+display sprite 7 2 4 format=indexed,size=8 AQIDBA==
+display sprite 7 2 4 offset=4,format=indexed,size=8 AQIDBA==
+display sprite 300 4 1 format=rgb565,encoding=rle QwAA
+display blit 7 -1 30
+"""
+
+
+def corpus():
+    Simulator()  # Registers the palette named and indexed colours refer to
+    return parse_batch(CORPUS.encode("utf-8"))
+
+
+def decoded(batch, data, pool=None):
+    got = parse_binary(memoryview(data), pool)
+    assert got is not None and len(got) == len(batch)
+    for want, cmd in zip(batch, got):
+        for slot in want.__slots__:
+            a = getattr(want, slot)
+            b = getattr(cmd, slot)
+            if slot in ("fg", "bg", "color_outline") and a != NO_COLOR and a not in DEVICE_PALETTE:
+                a = rgb565_to_rgb(rgb_to_rgb565(a))  # Sent as RGB565
+            assert a == b, "%s: %r != %r" % (slot, a, b)
+    return got
+
+
+def test_corpus():
+    batch = corpus()
+    data = encode(batch)
+    assert len(batch) == 28 and data[1] == VERSION
+    decoded(batch, data)
+
+
+def test_corpus_version_1():  # Without the commands using layout fields
+    batch = [c for c in corpus() if not _layout(c)]
+    data = encode(batch)
+    assert data[1] == 1
+    decoded(batch, data)
+
+
+@pytest.mark.parametrize("size", [4, 64])
+def test_corpus_pooled(size):  # Twice: reused records and strings
+    batch = corpus()
+    data = encode(batch)
+    pool = CommandPool(size)
+    for _ in range(2):
+        pool.release(decoded(batch, data, pool))
@@ -0,0 +1,60 @@
+from command import (
+    A_INT, A_STYLE, COMMANDS, OP_BLIT, OP_WIDGET, S_COLOR_FG, parse_batch, parse_command, register,
+)
+from simulator import Simulator
+
+SCHEMA = ((A_INT, "x"), (A_INT, "y"), (A_STYLE, None, (S_COLOR_FG,)))
+
+
+def test_plugin_namespace_parsed_and_drawn():
+    drawn = []
+
+    def dot(renderer, cmd, x, y):
+        drawn.append((x, y, cmd.fg))
+        return True
+
+    op = register(b"test", b"dot", SCHEMA, dot)
+    assert op > OP_BLIT and COMMANDS[op].draw is dot
+    assert register(b"test", b"dot", SCHEMA, dot) == op  # Registered anew
+    assert parse_command(b"TEST Dot 1 2").op == op
+    sim = Simulator()
+    sim.publish("display clear\ntest dot 3 4 color_fg=#ff0000")
+    assert drawn == [(3, 4, 0xff0000)]
+
+
+def test_receive_handler_leads_message():
+    received = []
+
+    def note(dispatcher, batch, i, msg, end):
+        received.append(bytes(msg[:end]))
+        return i + 1
+
+    register(b"test", b"note", (), receive=note)
+    sim = Simulator()
+    sim.publish("test note\ndisplay rect 0 0 4 4 color_fg=#ffffff")
+    assert received == [b"test note\ndisplay rect 0 0 4 4 color_fg=#ffffff"]
+    assert sim.image()[0, 0].tolist() == [255, 255, 255]
+
+
+def test_define_and_sprite_handled_by_registry():
+    sim = Simulator()
+    sim.publish("display define box\ndisplay rect 0 0 2 2 color_fg=#00ff00")
+    sim.publish("display sprite 1 1 1 format=rgb888 AAD/\ndisplay call box 4 4\ndisplay blit 1 0 0")
+    assert sim.renderer.sprites.get(1) is not None
+    assert sim.image()[4, 4].tolist() == [0, 255, 0]
+    assert sim.image()[0, 0].tolist() == [0, 0, 255]
+
+
+def test_style_keys_checked_per_command(capsys):
+    assert parse_command(b"display rect 0 0 4 4 color_fg=red,outline=1").fg == 0xff0000
+    assert parse_command(b"display rect 0 0 4 4 scale=2") is None  # Text only
+    assert parse_command(b"display layer 0 0 4 4 z=1,colour=red") is None
+    assert parse_command(b"display sprite 1 1 1 format=rgb888 color_fg=red AAD/") is None
+    assert "Unknown style 'colour'" in capsys.readouterr().out
+
+
+def test_content_starts_at_unknown_key():
+    widget, text = parse_batch(
+        b"display widget 0 0 60 8 color_fg=white n={n}\ndisplay text 0 0 0 0 scale=2 scale")
+    assert widget.op == OP_WIDGET and widget.content == "n={n}"
+    assert text.scale == 2 and text.content == "scale"
@@ -0,0 +1,80 @@
+import uasyncio as asyncio
+
+from inbox import Inbox
+from simulator import Simulator
+
+
+def test_error_drops_only_its_message(monkeypatch):
+    sim = Simulator()
+    renderer = sim.renderer
+    draw = renderer.draw
+
+    def broken(cmd):
+        raise RuntimeError("broken handler")
+
+    monkeypatch.setattr(renderer, "draw", broken)
+    sim.publish("display rect 0 0 4 4 color_fg=#ffffff")
+    monkeypatch.setattr(renderer, "draw", draw)
+    sim.publish("display rect 0 0 4 4 color_fg=#ffffff")
+    assert sim.image()[0, 0].tolist() == [255, 255, 255]
+
+
+def test_render_task_survives_errors(monkeypatch):
+    sim = Simulator()
+    dispatcher = sim.dispatcher
+    dispatcher.inbox = Inbox()
+    dispatcher.inbox.put(b"i75/sim", b"display rect 0 0 4 4 color_fg=#ffffff", False)
+    ticks = []
+
+    def tick():
+        ticks.append(1)
+        if len(ticks) == 1:
+            raise RuntimeError("broken animation")
+
+    monkeypatch.setattr(sim.renderer.anims, "tick", tick)
+
+    async def run():
+        task = asyncio.create_task(sim.renderer.run(dispatcher.drain))
+        await asyncio.sleep_ms(100)
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(ticks) > 1
+    assert sim.image()[0, 0].tolist() == [255, 255, 255]
+
+
+def test_parses_slot_buffer_in_place():
+    sim = Simulator()
+    dispatcher = sim.dispatcher
+    dispatcher.inbox = Inbox(2, buf_size=64)
+    pool = dispatcher.pool
+    for color in (b"#ffffff", b"#0000ff", b"#ffffff"):
+        sim.publish(b"display rect 0 0 4 4 color_fg=" + color + b"\ndisplay rect 9 9 1 1")
+        dispatcher.drain()
+        free = pool._n
+    sim.publish(b"display clear")  # Shorter: the slot still holds the old tail
+    dispatcher.drain()
+    assert sim.image()[0, 0].tolist() == [0, 0, 0]
+    assert pool._n == free  # Records came back to the pool
+
+
+def test_frames_decoded_from_inbox_buffer(monkeypatch):
+    from binary_encoder import ENC_RAW, encode, frame_command
+
+    sim = Simulator()
+    dispatcher = sim.dispatcher
+    inbox = dispatcher.inbox = Inbox(2, large_size=4096)
+    frames = sim.renderer.frames
+    draw = frames.draw
+    seen = []
+
+    def spy(cmd, x, y):
+        seen.append(cmd.data.obj if type(cmd.data) is memoryview else None)
+        return draw(cmd, x, y)
+
+    monkeypatch.setattr(frames, "draw", spy)
+    for pixel in (b"\x00\xf8", b"\x1f\x00"):  # RGB565 red, then blue
+        sim.publish(encode([frame_command(0, 0, 32, 32, pixel * 1024, encoding=ENC_RAW)]))
+        dispatcher.drain()
+    assert len(seen) == 2 and all(b is inbox._large for b in seen)  # Views, one buffer
+    assert sim.image()[0, 0].tolist() == [0, 0, 248]
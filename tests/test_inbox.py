@@ -0,0 +1,48 @@
+from inbox import COALESCE, Inbox
+
+
+def drained(inbox):
+    out = []
+    inbox.drain(lambda topic, msg, retained, n: out.append((topic, msg, bytes(msg[:n]))))
+    return out
+
+
+def test_payload_copied_into_slot_buffer():
+    inbox = Inbox(2, buf_size=32)
+    received = bytearray(b"display clear")
+    inbox.put(memoryview(b"i75/a"), memoryview(received), False)
+    received[:] = b"overwritten!!"  # The MQTT client reuses its buffer
+    (_, first, payload), = drained(inbox)
+    assert payload == b"display clear"
+    inbox.put(memoryview(b"i75/a"), memoryview(b"display rect 0 0 1 1"), False)
+    inbox.put(memoryview(b"i75/a"), memoryview(b"display clear"), False)
+    (_, a, pa), (_, b, pb) = drained(inbox)
+    assert (pa, pb) == (b"display rect 0 0 1 1", b"display clear")
+    assert (first is a or first is b) and len(a) == len(b) == 32  # Reused, not reallocated
+
+
+def test_large_payload_gets_its_own_buffer():
+    inbox = Inbox(2, buf_size=8)
+    inbox.put(b"i75/a", b"display rect 0 0 1 1", False)
+    (_, msg, payload), = drained(inbox)
+    assert payload == b"display rect 0 0 1 1" and len(msg) == 20
+
+
+def test_topics_interned():
+    inbox = Inbox(4, COALESCE)
+    inbox.put(memoryview(b"i75/a"), b"1", False)
+    inbox.put(memoryview(b"i75/b"), b"2", False)
+    assert not inbox.put(memoryview(bytearray(b"i75/a")), b"3", False)  # Coalesced
+    (ta, _, pa), (tb, _, pb) = drained(inbox)
+    assert (ta, pa, tb, pb) == (b"i75/a", b"3", b"i75/b", b"2")
+    inbox.put(memoryview(b"i75/a"), b"4", False)
+    assert drained(inbox)[0][0] is ta
+
+
+def test_coalesce_with_more_topics_than_interned():
+    inbox = Inbox(16, COALESCE, topics=8)
+    for k in range(10):
+        inbox.put(b"i75/t%d" % k, b"old", False)
+    for k in range(10):
+        assert not inbox.put(memoryview(b"i75/t%d" % k), b"new", False)
+    assert [p for _, _, p in drained(inbox)] == [b"new"] * 10
@@ -0,0 +1,22 @@
+from simulator import Simulator
+
+LAYER = "display layer 0 0 8 8\ndisplay rect 0 0 8 8 color_fg=#ffffff"
+
+
+def test_layer_redrawn_after_clear():
+    sim = Simulator()
+    sim.publish(LAYER, b"i75/clock")
+    assert sim.image()[4, 4].tolist() == [255, 255, 255]
+    sim.publish("display clear", b"i75/other")
+    assert sim.image()[4, 4].tolist() == [0, 0, 0]
+    sim.publish(LAYER, b"i75/clock", retained=True)  # Identical resend
+    assert sim.image()[4, 4].tolist() == [255, 255, 255]
+
+
+def test_identical_update_skipped():
+    sim = Simulator()
+    sim.publish(LAYER, b"i75/clock")
+    sim.flush()
+    updates = sim.updates
+    sim.publish(LAYER, b"i75/clock")
+    assert not sim.flush() and sim.updates == updates
@@ -0,0 +1,164 @@
+import asyncio
+import random
+
+import pytest
+
+from broker import Broker
+import mqtt_as
+
+TOPIC = "i75/test"
+
+
+async def connect(broker, **kw):
+    config = dict(mqtt_as.config)
+    config.update(server="127.0.0.1", port=broker.port, **kw)
+    client = mqtt_as.MQTTClient(config)
+    await client.connect(quick=True)
+    return client
+
+
+async def wait_until(done, timeout=10):
+    for _ in range(int(timeout * 1000)):
+        if done():
+            return
+        await asyncio.sleep(0.001)
+    raise AssertionError("Timed out")
+
+
+@pytest.mark.parametrize("rx_buf", [4, 64, 1024])
+def test_packets_framed_intact(rx_buf):
+    # Packets smaller and larger than the receive buffer, split across reads
+    # and several per read, with QoS 0 and 1 headers
+    rng = random.Random(rx_buf)
+    payloads = [rng.randbytes(rng.randint(0, 5000)) for _ in range(300)]
+    received = []
+
+    async def run():
+        broker = await Broker().start()
+        client = await connect(broker, rx_buf=rx_buf, drain_budget=16, subs_cb=lambda topic, msg, retained:
+                               received.append((bytes(topic), bytes(msg))))
+        for i, payload in enumerate(payloads):
+            await broker.send("%s/%d" % (TOPIC, i), payload, i & 1)
+        await wait_until(lambda: len(received) == len(payloads))
+        await client.disconnect()
+        await broker.stop()
+        return broker.pubacks
+
+    pubacks = asyncio.run(run())
+    assert received == [(b"%s/%d" % (TOPIC.encode(), i), p) for i, p in enumerate(payloads)]
+    assert pubacks == len(payloads) // 2
+
+
+def test_pipelined_publishes_acked():
+    async def run():
+        broker = await Broker().start()
+        client = await connect(broker, max_inflight=8)
+        await asyncio.gather(*(client.publish(TOPIC, b"%d" % i, qos=1) for i in range(20)))
+        await wait_until(lambda: not client._inflight)
+        await client.disconnect()
+        await broker.stop()
+        return broker, client
+
+    broker, client = asyncio.run(run())
+    assert sorted(broker.published) == sorted((TOPIC.encode(), b"%d" % i) for i in range(20))
+    assert broker.duplicates == 0
+    assert not client.rcv_pids
+
+
+def test_inflight_window():
+    # Without PUBACKs, max_inflight publishes go out and the next one waits
+    async def run():
+        broker = await Broker().start()
+        broker.withhold = 20
+        client = await connect(broker, max_inflight=8)
+        tasks = [asyncio.create_task(client.publish(TOPIC, b"%d" % i, qos=1)) for i in range(20)]
+        await wait_until(lambda: len(broker.published) == 8)
+        await asyncio.sleep(0.1)
+        sent = len(broker.published)
+        inflight = len(client._inflight)
+        done = sum(t.done() for t in tasks)
+        for t in tasks:
+            t.cancel()
+        await client.disconnect()
+        await broker.stop()
+        return sent, inflight, done
+
+    assert asyncio.run(run()) == (8, 8, 8)
+
+
+def test_resent_after_lost_puback():
+    async def run():
+        broker = await Broker().start()
+        broker.withhold = 1
+        client = await connect(broker, response_time=0.2)
+        await client.publish(TOPIC, b"again", qos=1)
+        assert client._inflight  # Returns once written, before the PUBACK
+        await wait_until(lambda: not client._inflight)
+        await client.disconnect()
+        await broker.stop()
+        return broker, client
+
+    broker, client = asyncio.run(run())
+    assert broker.published == [(TOPIC.encode(), b"again")] * 2
+    assert broker.duplicates == 1
+    assert client.REPUB_COUNT == 1
+
+
+def test_backoff_bounds():
+    client = mqtt_as.MQTTClient(dict(mqtt_as.config, server="127.0.0.1", backoff_min=500, backoff_max=30000))
+    for n in range(24):
+        delay = min(500 << n, 30000)
+        for _ in range(20):
+            assert delay // 2 <= client._backoff(n) <= delay
+
+
+def test_reconnect_after_backoff():
+    # Only the broker connection is lost: it is remade after the first
+    # backoff delay, without restarting Wi-Fi
+    connects = []
+
+    async def on_connect(client):
+        connects.append(asyncio.get_running_loop().time())
+
+    async def run():
+        broker = await Broker().start()
+        client = await connect(broker, backoff_min=400, backoff_max=400, connect_coro=on_connect)
+        await wait_until(lambda: connects)
+        t = asyncio.get_running_loop().time()
+        broker.drop()
+        await wait_until(lambda: len(connects) == 2)
+        await client.disconnect()
+        await broker.stop()
+        return connects[1] - t
+
+    assert 0.2 <= asyncio.run(run()) < 0.9
+
+
+def test_backoff_grows_until_reconnected():
+    attempts = []
+    connects = []
+
+    async def on_connect(client):
+        connects.append(client)
+
+    async def run():
+        broker = await Broker().start()
+        port = broker.port
+        client = await connect(broker, backoff_min=20, backoff_max=80, connect_coro=on_connect)
+        backoff = client._backoff
+        client._backoff = lambda n: attempts.append(n) or backoff(n)
+        broker.drop()
+        await broker.stop()  # Reconnects are refused
+        await wait_until(lambda: len(attempts) >= 5)
+        broker = await Broker().start(port=port)
+        await wait_until(lambda: len(connects) == 2)
+        up = len(attempts)
+        broker.drop()
+        await wait_until(lambda: len(connects) == 3)
+        await client.disconnect()
+        await broker.stop()
+        return up
+
+    up = asyncio.run(run())
+    assert attempts[:up] == list(range(up))
+    assert attempts[up] == 0  # Counted from the last connection
@@ -0,0 +1,28 @@
+import pytest
+
+from command import parse_batch
+from scan import equals, find, same, skip_space, token_end, token_start, trim_end
+
+LINE = b"  display\tTEXT 1 2  a=b,c=d  \r"
+
+
+@pytest.mark.parametrize("kind", (bytes, bytearray, memoryview))
+def test_scan_any_buffer(kind):
+    buf = kind(LINE)
+    n = len(LINE)
+    assert skip_space(buf, 0, n) == 2
+    assert token_end(buf, 2, n) == 9
+    assert equals(buf, 10, 14, b"text") and not equals(buf, 10, 14, b"rect")
+    assert same(buf, 10, 14, b"TEXT") and not same(buf, 10, 14, b"text")
+    assert find(buf, b"=", 0, n) == 21 and find(buf, b"#", 0, n) == n
+    assert trim_end(buf, 0, n) == 27
+    assert token_start(buf, 0, 27) == 20
+
+
+@pytest.mark.parametrize("kind", (bytearray, memoryview))
+def test_parse_batch_same_for_any_buffer(kind):
+    payload = b"display rect 0 0 4 4 color_fg=red\ndisplay text 1 2 0 0 scale=2 Hi\n"
+    want = parse_batch(payload)
+    got = parse_batch(kind(payload + b"stale tail"), None, len(payload))
+    assert [(c.op, c.x, c.y, c.fg, c.scale, c.content) for c in got] == \
+        [(c.op, c.x, c.y, c.fg, c.scale, c.content) for c in want]
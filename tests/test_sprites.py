@@ -0,0 +1,26 @@
+from command import parse_command
+from sprites import SpriteCache
+
+CHUNKS = (
+    b"display sprite 7 2 4 format=indexed,size=8 AQIDBA==",
+    b"display sprite 7 2 4 offset=4,format=indexed,size=8 BQYHCA==",
+)
+
+
+def test_late_chunk_after_reload(tmp_path):
+    cache = SpriteCache()
+    cache.open(str(tmp_path))
+    for chunk in CHUNKS:
+        assert cache.load(parse_command(chunk))  # Complete: saved to flash
+    reloaded = SpriteCache()  # As after eviction or a reboot
+    reloaded.open(str(tmp_path))
+    sprite = reloaded.get(7)
+    assert bytes(sprite.data) == bytes(range(1, 9))
+    assert reloaded.load(parse_command(CHUNKS[1]))  # Repeated chunk is harmless
+    assert bytes(reloaded.get(7).data) == bytes(range(1, 9))
+
+
+def test_chunk_out_of_order(capsys):
+    cache = SpriteCache()
+    assert not cache.load(parse_command(CHUNKS[1]))
+    assert "out of order" in capsys.readouterr().out
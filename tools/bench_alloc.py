@@ -0,0 +1,96 @@
+# Allocation check for the whole receive -> parse -> draw path of clear/rect/
+# text messages: each goes through Dispatcher.on_message (as memoryviews, the
+# way the MQTT client delivers them), the Inbox, the pooled parser and the
+# Renderer, and the frame is flushed as the render task does. Runs on the
+# device with src/ mounted, or on CPython against the simulator:
+#
+#     mpremote mount src run tools/bench_alloc.py
+#     python3 tools/bench_alloc.py [iterations]
+#
+# Under MicroPython GC is disabled after a warm-up and the run fails if
+# gc.mem_alloc() grows at all. CPython allocates for its own integers and
+# frames, so there the tracemalloc peak per message is only reported. The
+# topic and message views the MQTT client slices per packet are outside this
+# path.
+import gc
+import sys
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:  # CPython: run against the simulator
+    sys.path.insert(0, (__file__.rpartition("/")[0] or ".") + "/../sim")
+    from simulator import install
+
+    install()
+    from time import ticks_us, ticks_diff
+
+from command import CommandPool
+from dispatch import Dispatcher
+from inbox import Inbox
+from interstate75 import Interstate75
+from layers import Compositor
+from metrics import Metrics
+from renderer import Renderer
+
+MICROPYTHON = sys.implementation.name == "micropython"  # The simulator fakes gc.mem_alloc
+TOPIC = b"i75/clock"
+MESSAGES = (
+    b"display clear",
+    b"display rect 0 0 128 64 color_fg=#0000cc",
+    b"display rect 2 2 124 60 color_fg=#000000",
+    b"display text 8 4 0 0 color_fg=#ffff00 Date",
+    b"display text 8 12 0 0 color_fg=#ffffff,scale=2 01/01/25",
+    b"display text 8 36 0 0 color_fg=#ffffff,scale=2 12:34:56",
+    b"display rect 0 0 128 64 color_fg=#0000cc\n"
+    b"display text 8 36 0 0 color_fg=#ffffff,scale=2 12:34:56",
+)
+
+
+def run(dispatcher, renderer, views, n):
+    for _ in range(n):
+        for topic, msg in views:
+            dispatcher.on_message(topic, msg, False)
+            dispatcher.drain()
+            renderer.flush()
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    i75 = Interstate75(display=Interstate75.DISPLAY_INTERSTATE75_128X128)
+    metrics = Metrics(b"i75/stats/get")
+    renderer = Renderer(i75, metrics=metrics)
+    dispatcher = Dispatcher(renderer, metrics, Inbox(), Compositor(renderer), CommandPool())
+    views = [(memoryview(TOPIC), memoryview(msg)) for msg in MESSAGES]
+    run(dispatcher, renderer, views, 2)  # Warm up the pools and caches
+    count = n * len(views)
+
+    if MICROPYTHON:
+        gc.collect()
+        gc.disable()
+        a = gc.mem_alloc()
+        t = ticks_us()
+        run(dispatcher, renderer, views, n)
+        us = ticks_diff(ticks_us(), t)
+        used = gc.mem_alloc() - a
+        gc.enable()
+    else:
+        import tracemalloc
+
+        tracemalloc.start()
+        base = tracemalloc.get_traced_memory()[0]
+        t = ticks_us()
+        run(dispatcher, renderer, views, n)
+        us = ticks_diff(ticks_us(), t)
+        used = tracemalloc.get_traced_memory()[1] - base
+        tracemalloc.stop()
+    print("%d messages, %d msgs/s, %.1f bytes/msg, %d dropped" % (
+        count, count * 1000000 // max(us, 1), used / count, metrics.dropped))
+    if metrics.dropped:
+        print("FAIL: messages were rejected")
+        sys.exit(1)
+    if MICROPYTHON and used:
+        print("FAIL: the receive -> draw path allocated %d bytes" % used)
+        sys.exit(1)
+
+
+main()
@@ -0,0 +1,235 @@
+# End-to-end benchmark: MQTTClient (src/mqtt_as.py) receiving display
+# workloads from the in-process broker stand-in (sim/broker.py) over loopback,
+# rendering through the simulator backend. Messages go through the Dispatcher
+# as src/main.py builds it: queued in an Inbox by the MQTT callback, then
+# drained, drawn and pushed by the render task.
+#
+#     python3 tools/bench_e2e.py [--workload NAME ...] [--messages N]
+#                                [--rate MSGS_PER_S] [--replay FILE]
+#                                [--inbox-size N] [--policy POLICY]
+#                                [--alloc] [--out results.json]
+#
+# For each workload reports msgs/s, publish -> update() latency percentiles
+# (including time queued), messages dropped or coalesced by the inbox, CPU
+# time and (with --alloc, which slows the run) transient bytes allocated
+# while receiving and drawing each message. Results are printed (or written)
+# as JSON.
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "sim"))
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+from simulator import Simulator, install  # noqa: E402
+
+install()  # Device stand-ins must be importable before mqtt_as
+from broker import Broker  # noqa: E402
+import binary_encoder  # noqa: E402
+import mqtt_as  # noqa: E402
+from command import CommandPool  # noqa: E402
+from dispatch import Dispatcher  # noqa: E402
+from inbox import COALESCE, DROP_NEWEST, DROP_OLDEST, Inbox  # noqa: E402
+from layers import Compositor  # noqa: E402
+from metrics import Metrics  # noqa: E402
+
+TOPIC = "i75/bench"
+POLICIES = {"drop_oldest": DROP_OLDEST, "drop_newest": DROP_NEWEST, "coalesce": COALESCE}
+
+# As in src/main.py
+INBOX_BUF_SIZE = 256
+INBOX_LARGE_SIZE = 128 * 128 * 2 + 64
+COMMAND_POOL_SIZE = 16
+MAX_LAYERS = 16
+
+
+def dashboard(i):  # test.sh style refresh as one batch
+    return (
+        "display rect 2 2 124 60 color_fg=#000000\n"
+        "display text 8 4 0 0 color_fg=#ffff00 Date\n"
+        "display text 8 12 0 0 color_fg=#ffffff,scale=2 %02d/01/25\n"
+        "display text 8 28 0 0 color_fg=#ffff00 Time\n"
+        "display text 8 36 0 0 color_fg=#ffffff,scale=2 12:%02d:%02d" % (i % 31, i // 60 % 60, i % 60)
+    ).encode()
+
+
+def mixed(i):  # One primitive per message
+    k = i % 3
+    if k == 0:
+        return b"display rect %d %d 16 16 color_fg=#%06x" % (i % 112, i * 7 % 112, i * 2654435761 & 0xFFFFFF)
+    if k == 1:
+        return b"display text %d %d 0 0 color_fg=#ffffff n%d" % (i % 100, i * 3 % 120, i)
+    return b"display rect 0 0 128 128 color_fg=#%06x" % (i & 0xFF)
+
+
+def large(i):  # Long content strings
+    return b"display text 0 %d 0 0 color_fg=#00ff00 %s" % (i % 120, (b"%d " % i) * 400)
+
+
+def binary(i):
+    return binary_encoder.encode_text(dashboard(i).decode())
+
+
+def frame(i):  # Full 128x128 RGB565 frame, alternating delta updates
+    px = bytes((i & 0xFF, 0x1F)) * (128 * 128)
+    return binary_encoder.encode([binary_encoder.frame_command(0, 0, 128, 128, px, encoding=0)])
+
+
+WORKLOADS = {"dashboard": dashboard, "mixed": mixed, "large": large, "binary": binary, "frame": frame}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run_workload(payloads, rate, alloc, drain_budget, inbox_size, policy):
+    broker = await Broker().start()
+    sim = Simulator()
+    renderer = sim.renderer
+    metrics = Metrics(b"stats/bench")
+    dispatcher = Dispatcher(
+        renderer, metrics, Inbox(inbox_size, policy, INBOX_BUF_SIZE, large_size=INBOX_LARGE_SIZE),
+        Compositor(renderer, MAX_LAYERS), CommandPool(COMMAND_POOL_SIZE)
+    )
+    sent = []  # Send time per message
+    waiting = {}  # Payload -> indices of messages with it, queued in order
+    pending = []  # Messages drawn but not yet pushed to the panel
+    latency = []
+    alloc_bytes = []
+    received = 0
+    on_message = dispatcher.on_message
+    handle = dispatcher.handle
+
+    def measured(fn, *args):
+        if not alloc:
+            return fn(*args)
+        tracemalloc.start()
+        fn(*args)
+        alloc_bytes.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    def on_update(_graphics):
+        now = time.perf_counter()
+        for i in pending:
+            latency.append(now - sent[i])
+        pending.clear()
+
+    def receive(topic, msg, retained):  # MQTT callback
+        nonlocal received
+        waiting.setdefault(bytes(msg), []).append(received)
+        received += 1
+        measured(on_message, topic, msg, retained)
+
+    def draw(topic, msg, retained, end):  # Inbox drain handler
+        i = waiting[bytes(msg[:end])].pop(0)
+        measured(handle, topic, msg, retained, end)
+        if renderer.dirty:
+            pending.append(i)
+        else:  # Nothing to push: complete once drawn
+            latency.append(time.perf_counter() - sent[i])
+
+    dispatcher._handler = draw
+    sim.i75.on_update = on_update
+    config = dict(mqtt_as.config)
+    config.update(server="127.0.0.1", port=broker.port, subs_cb=receive,
+                  drain_budget=drain_budget, keepalive=60, rx_buf=1024)
+
+    async def on_connect(client):
+        await client.subscribe(TOPIC + "/#", 1)
+
+    config["connect_coro"] = on_connect
+    client = mqtt_as.MQTTClient(config)
+    render = asyncio.create_task(renderer.run(dispatcher.drain))
+    await client.connect(quick=True)
+    await asyncio.wait_for(broker.subscribed.wait(), 10)
+
+    cpu = time.process_time()
+    t0 = time.perf_counter()
+    interval = 1 / rate if rate else 0
+    for i, payload in enumerate(payloads):
+        sent.append(time.perf_counter())
+        await broker.send(TOPIC, payload)
+        if interval:
+            await asyncio.sleep(max(0, t0 + (i + 1) * interval - time.perf_counter()))
+    deadline = time.perf_counter() + 30
+    while len(latency) + metrics.dropped < len(payloads) and time.perf_counter() < deadline:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - t0
+    cpu = time.process_time() - cpu
+
+    render.cancel()
+    await client.disconnect()
+    await broker.stop()
+    n = len(latency)
+    ms = [1000 * v for v in latency]
+    return {
+        "messages": len(payloads),
+        "completed": n,
+        "dropped": metrics.dropped,
+        "payload_bytes": sum(len(p) for p in payloads) // max(len(payloads), 1),
+        "msgs_per_s": round(n / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(ms, 50), 3) if ms else None,
+            "p99": round(percentile(ms, 99), 3) if ms else None,
+            "max": round(max(ms), 3) if ms else None,
+        },
+        "cpu_ms_per_msg": round(1000 * cpu / max(n, 1), 4),
+        "alloc_bytes_per_msg": round(sum(alloc_bytes) / max(n, 1)) if alloc_bytes else None,
+        "panel_updates": sim.updates,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--workload", action="append", choices=sorted(WORKLOADS))
+    ap.add_argument("--messages", type=int, default=200)
+    ap.add_argument("--rate", type=float, default=0, help="msgs/s, 0 = burst")
+    ap.add_argument("--replay", help="payload file, blank line between messages")
+    ap.add_argument("--drain-budget", type=int, default=16)
+    ap.add_argument("--inbox-size", type=int, default=16)
+    ap.add_argument("--policy", choices=sorted(POLICIES), default="drop_oldest")
+    ap.add_argument("--alloc", action="store_true", help="measure allocations (slower)")
+    ap.add_argument("--out", help="write JSON here instead of stdout")
+    args = ap.parse_args()
+
+    runs = {}
+    if args.replay:
+        with open(args.replay, "rb") as f:
+            runs["replay"] = [m.strip() for m in f.read().split(b"\n\n") if m.strip()]
+    for name in args.workload or ([] if args.replay else sorted(WORKLOADS)):
+        runs[name] = [WORKLOADS[name](i) for i in range(args.messages)]
+
+    results = {
+        "mqtt_as_version": ".".join(str(v) for v in mqtt_as.VERSION),
+        "python": platform.python_version(),
+        "rate": args.rate,
+        "drain_budget": args.drain_budget,
+        "inbox_size": args.inbox_size,
+        "policy": args.policy,
+        "workloads": {},
+    }
+    with contextlib.redirect_stdout(sys.stderr):  # Keep device logging out of the JSON
+        for name, payloads in runs.items():
+            results["workloads"][name] = asyncio.run(
+                run_workload(payloads, args.rate, args.alloc, args.drain_budget,
+                             args.inbox_size, POLICIES[args.policy]))
+    out = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Micro-benchmark: the original dict based parser (tools/legacy_parser.py)
+# against the byte parser (src/command.py). Runs on CPython or the MicroPython
+# unix port:
+#
+#     python3 tools/bench_parser.py [iterations]
+#     micropython tools/bench_parser.py [iterations]
+#
+# Reports messages/second, the slowdown against the legacy parser, and memory
+# allocated per message. The byte parser is run on bytes and on the input it
+# gets on the device, the inbox's bytearray buffers, and on memoryviews (no
+# inbox). Under MicroPython allocation is measured with gc.mem_alloc() deltas
+# while GC is disabled (all bytes allocated), and the run fails if parsing
+# with a CommandPool allocates at all; under CPython tracemalloc reports the
+# transient peak. Scanning is done by viper loops under MicroPython and by
+# bytes/bytearray methods under CPython (see src/scan.py), so CPython rates
+# say little about the device.
+import gc
+import sys
+
+sys.path.insert(0, (__file__.rpartition("/")[0] or ".") + "/../src")
+
+import command
+import legacy_parser
+
+try:
+    from time import ticks_us, ticks_diff
+except ImportError:
+    from time import perf_counter_ns
+
+    def ticks_us():
+        return perf_counter_ns() // 1000
+
+    def ticks_diff(a, b):
+        return a - b
+
+
+MESSAGES = (
+    b"display clear",
+    b"display rect 0 0 128 64 color_fg=#0000cc",
+    b"display rect 2 2 124 60 color_fg=#000000",
+    b"display text 8 4 0 0 color_fg=#ffff00 Date",
+    b"display text 8 12 0 0 color_fg=#ffffff,scale=2 01/01/25",
+    b"display text 8 36 0 0 color_fg=#ffffff,scale=2 12:34:56",
+)
+
+
+def legacy(msg):
+    legacy_parser.parse_mqtt_message(msg.decode("utf-8"))
+
+
+def byte_parser(msg):
+    command.parse_command(msg)
+
+
+_record = command.Command()
+
+
+def byte_parser_reuse(msg):  # Caller supplies the record
+    command.parse_command(msg, cmd=_record)
+
+
+_pool = command.CommandPool()
+
+
+def byte_parser_pool(msg):  # As the Dispatcher: batch from the pool, given back once drawn
+    _pool.release(command.parse_batch(msg, _pool))
+
+
+def inputs(kind):  # MESSAGES as the given buffer type
+    return tuple(kind(m) for m in MESSAGES)
+
+
+def alloc_per_msg(fn, msg, n):
+    if hasattr(gc, "mem_alloc"):  # MicroPython
+        fn(msg)  # Warm up caches outside the measurement
+        gc.collect()
+        gc.disable()
+        a = gc.mem_alloc()
+        for _ in range(n):
+            fn(msg)
+        used = gc.mem_alloc() - a
+        gc.enable()
+        return used / n
+    import tracemalloc
+
+    tracemalloc.start()
+    fn(msg)  # Warm up caches outside the measurement
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    fn(msg)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return peak
+
+
+def rate(fn, messages, n):
+    t = ticks_us()
+    for _ in range(n):
+        for msg in messages:
+            fn(msg)
+    us = ticks_diff(ticks_us(), t)
+    return n * len(messages) * 1000000 / max(us, 1)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("%-18s %12s %10s %14s" % ("parser", "msgs/s", "x legacy", "bytes/msg"))
+    base = None
+    failed = []
+    for name, fn, kind in (
+        ("legacy", legacy, bytes),
+        ("bytes", byte_parser, bytes),
+        ("bytes+record", byte_parser_reuse, bytes),
+        ("bytes+pool", byte_parser_pool, bytes),
+        ("bytearray+pool", byte_parser_pool, bytearray),
+        ("memoryview+pool", byte_parser_pool, memoryview),
+    ):
+        messages = inputs(kind)
+        alloc = sum(alloc_per_msg(fn, m, 100) for m in messages) / len(messages)
+        r = rate(fn, messages, n)
+        if base is None:
+            base = r
+        print("%-18s %12d %10.2f %14.1f" % (name, r, r / base, alloc))
+        if fn is byte_parser_pool and alloc:
+            failed.append(name)
+    if hasattr(gc, "mem_alloc") and failed:  # The pooled path must not allocate
+        print("FAIL: allocated while parsing with a pool:", ", ".join(failed))
+        sys.exit(1)
+
+
+main()
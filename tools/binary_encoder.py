@@ -0,0 +1,226 @@
+# Host side encoder for the binary display protocol (src/binary.py).
+#
+#     python3 tools/binary_encoder.py < commands.txt > payload.bin
+#
+# Reads text protocol commands, one per line, and writes the equivalent binary
+# payload. tests/test_binary.py checks the device decoder returns the same
+# Commands as the text parser for what this encodes.
+import struct
+import sys
+
+sys.path.insert(0, (__file__.rpartition("/")[0] or ".") + "/../src")
+
+from binary import F_FG, F_BG, F_INDEXED, F_FONT, MAGIC, VERSION, rgb_to_rgb565
+from pens import DEFAULT_PALETTE, PALETTE
+from command import (
+    parse_batch, Command, NO_COLOR, OP_CLEAR, OP_FRAME, OP_LAYER, OP_RECT,
+    OP_DEFINE, OP_CALL, OP_ANIMATE, OP_SET, OP_ADD, OP_SPRITE, OP_BLIT,
+)
+
+# Frame constants, as in src/frame.py (not imported: it needs micropython)
+FMT_RGB565 = 0
+FMT_RGB888 = 1
+FMT_INDEXED = 2
+ENC_RAW = 0
+ENC_RLE = 1
+
+# Palette registered by the device Renderer, in registration (index) order.
+DEVICE_PALETTE = tuple(rgb for _, rgb in DEFAULT_PALETTE)
+
+
+def _color(c, indexed, palette):
+    if indexed:
+        return bytes((palette.index(c),))
+    return struct.pack("<H", rgb_to_rgb565(c))
+
+
+def _layout(cmd):  # Needs the version 2 layout fields
+    return cmd.flow != 0 or cmd.outline != 0 or cmd.color_outline != NO_COLOR
+
+
+def encode_command(cmd, palette=DEVICE_PALETTE, version=VERSION):
+    flags = cmd.op
+    if cmd.op == OP_CLEAR:
+        return bytes((flags,))
+    if cmd.op == OP_FRAME:
+        return bytes((flags,)) + struct.pack(
+            "<hhhhBBI", cmd.x, cmd.y, cmd.w, cmd.h, cmd.fmt >> 4, cmd.fmt & 0x0F,
+            len(cmd.data)) + bytes(cmd.data)
+    if cmd.op == OP_SPRITE:
+        return bytes((flags,)) + struct.pack(
+            "<HhhBBIII", cmd.sprite, cmd.w, cmd.h, cmd.fmt >> 4, cmd.fmt & 0x0F, cmd.size,
+            cmd.offset, len(cmd.data)) + bytes(cmd.data)
+    if cmd.op == OP_BLIT:
+        return bytes((flags,)) + struct.pack("<Hhh", cmd.sprite, cmd.x, cmd.y)
+    if cmd.op == OP_LAYER:
+        out = bytearray((flags | (F_FONT if cmd.layer is not None else 0),))
+        out += struct.pack("<hhhhb", cmd.x, cmd.y, cmd.w, cmd.h, cmd.z)
+        if cmd.layer is not None:
+            name = cmd.layer.encode("utf-8")
+            out.append(len(name))
+            out += name
+        return bytes(out)
+    if cmd.op == OP_DEFINE or cmd.op == OP_CALL:
+        out = bytearray((flags,))
+        if cmd.op == OP_CALL:
+            out += struct.pack("<hh", cmd.x, cmd.y)
+        name = cmd.content.encode("utf-8")
+        out.append(len(name))
+        return bytes(out + name)
+    if cmd.op == OP_SET or cmd.op == OP_ADD:
+        name = cmd.name.encode("utf-8")
+        out = bytearray((flags, len(name))) + name
+        if cmd.op == OP_ADD:
+            return bytes(out + struct.pack("<i", cmd.x))
+        value = cmd.content.encode("utf-8")
+        return bytes(out + struct.pack("<H", len(value)) + value)
+    colors = [c for c in (cmd.fg, cmd.bg) if c != NO_COLOR]
+    outline = [cmd.color_outline] if cmd.outline and cmd.color_outline != NO_COLOR else []
+    indexed = bool(colors + outline) and all(c in palette for c in colors + outline)
+    if cmd.fg != NO_COLOR:
+        flags |= F_FG
+    if cmd.bg != NO_COLOR:
+        flags |= F_BG
+    if indexed:
+        flags |= F_INDEXED
+    if cmd.op != OP_RECT and cmd.font is not None:
+        flags |= F_FONT
+    out = bytearray((flags,))
+    out += struct.pack("<hhhh", cmd.x, cmd.y, cmd.w, cmd.h)
+    for c in colors:
+        out += _color(c, indexed, palette)
+    if version > 1:
+        out.append(cmd.flow)
+        out.append(cmd.outline if cmd.color_outline != NO_COLOR else 0)
+        for c in outline:
+            out += _color(c, indexed, palette)
+    if cmd.op != OP_RECT:
+        out.append(cmd.scale)
+        if cmd.font is not None:
+            font = cmd.font.encode("utf-8")
+            out.append(len(font))
+            out += font
+        content = cmd.content.encode("utf-8")
+        out += struct.pack("<H", len(content))
+        out += content
+    if cmd.op == OP_ANIMATE:
+        out += struct.pack("<BHhhI", cmd.fmt, cmd.period, cmd.dx, cmd.dy,
+                           0xFFFFFFFF if cmd.color_to == NO_COLOR else cmd.color_to)
+    return bytes(out)
+
+
+def encode(commands, palette=DEVICE_PALETTE):
+    # Version 1 (no layout fields) unless a command needs them
+    version = VERSION if any(_layout(c) for c in commands) else 1
+    return bytes((MAGIC, version)) + b"".join(
+        encode_command(c, palette, version) for c in commands)
+
+
+def _rle(pixels, bpp, prev, key=None):
+    # Run-length encode pixels (bytes, bpp bytes each). With prev (the
+    # previous frame, same layout) unchanged pixels become skip tokens, as do
+    # pixels equal to key (bytes, a transparent colour).
+    px = [pixels[i:i + bpp] for i in range(0, len(pixels), bpp)]
+    old = [prev[i:i + bpp] for i in range(0, len(prev), bpp)] if prev else None
+    out = bytearray()
+    n = len(px)
+    i = 0
+
+    def unchanged(k):
+        return (old is not None and px[k] == old[k]) or px[k] == key
+
+    def run_len(k):
+        j = k + 1
+        while j < n and j - k < 64 and px[j] == px[k]:
+            j += 1
+        return j - k
+
+    while i < n:
+        if unchanged(i):
+            j = i
+            while j < n and unchanged(j):
+                j += 1
+            skip = j - i
+            while skip >= 64:
+                k = min(skip >> 6, 64)
+                out.append(0xC0 | (k - 1))
+                skip -= k << 6
+            if skip:
+                out.append(skip - 1)
+            i = j
+        elif run_len(i) >= 3:
+            k = run_len(i)
+            out.append(0x40 | (k - 1))
+            out += px[i]
+            i += k
+        else:
+            j = i
+            while j < n and j - i < 64 and not unchanged(j) and run_len(j) < 3:
+                j += 1
+            out.append(0x80 | (j - i - 1))
+            out += b"".join(px[i:j])
+            i = j
+    return bytes(out)
+
+
+def frame_command(x, y, w, h, pixels, fmt=FMT_RGB565, prev=None, encoding=None):
+    # Build an OP_FRAME Command for a w x h block of pixels at (x, y). pixels is
+    # RGB565 (little-endian) or RGB888 bytes in raster order. prev, if given,
+    # is the block previously sent for the same rect: unchanged pixels are
+    # skipped. encoding=None picks whichever of raw/RLE is smaller.
+    bpp = 2 if fmt == FMT_RGB565 else 3
+    if len(pixels) != w * h * bpp:
+        raise ValueError("Expected %d bytes of pixel data" % (w * h * bpp))
+    data = pixels
+    enc = ENC_RAW
+    if encoding != ENC_RAW:
+        rle = _rle(pixels, bpp, prev)
+        if encoding == ENC_RLE or len(rle) < len(pixels):
+            data = rle
+            enc = ENC_RLE
+    cmd = Command()
+    cmd.reset(OP_FRAME)
+    cmd.x, cmd.y, cmd.w, cmd.h = x, y, w, h
+    cmd.fmt = fmt << 4 | enc
+    cmd.data = data
+    return cmd
+
+
+def sprite_commands(sprite, w, h, pixels, fmt=FMT_RGB565, transparent=None, chunk=1024):
+    # Build the OP_SPRITE Commands uploading a w x h sprite, each carrying at
+    # most chunk bytes. pixels is RGB565 (little-endian), RGB888 or palette
+    # index bytes in raster order. Pixels equal to transparent (a pixel's
+    # bytes) are left out, which needs run-length encoding; otherwise it is
+    # used if smaller.
+    bpp = 2 if fmt == FMT_RGB565 else 1 if fmt == FMT_INDEXED else 3
+    if len(pixels) != w * h * bpp:
+        raise ValueError("Expected %d bytes of pixel data" % (w * h * bpp))
+    data = _rle(pixels, bpp, None, transparent)
+    enc = ENC_RLE
+    if transparent is None and len(data) >= len(pixels):
+        data = pixels
+        enc = ENC_RAW
+    commands = []
+    for offset in range(0, len(data), chunk):
+        cmd = Command()
+        cmd.reset(OP_SPRITE)
+        cmd.sprite, cmd.w, cmd.h = sprite, w, h
+        cmd.fmt = fmt << 4 | enc
+        cmd.size = len(data)
+        cmd.offset = offset
+        cmd.data = data[offset:offset + chunk]
+        commands.append(cmd)
+    return commands
+
+
+def encode_text(text, palette=DEVICE_PALETTE):
+    commands = parse_batch(text.encode("utf-8"))
+    if commands is None:
+        raise ValueError("Invalid text commands")
+    return encode(commands, palette)
+
+
+if __name__ == "__main__":
+    for name, rgb in DEFAULT_PALETTE:  # Colour names, as the device registers them
+        PALETTE[name] = rgb
+    sys.stdout.buffer.write(encode_text(sys.stdin.read()))
@@ -1,3 +1,7 @@
+# The original dict based parser, kept only as the baseline for
+# tools/bench_parser.py. The client uses src/command.py.
+
+
 def parse_rect(parts):
     if len(parts) < 4:
         return None, parts  # Not enough parts for RECT
@@ -56,7 +60,7 @@ def parse_mqtt_message(message):
     if command == "clear":
         if len(param_parts):
             print(
-                f"Error: Command 'clear' does not accept parameters, got '{remaining_params_str}'"
+                f"Error: Command 'clear' does not accept parameters, got '{' '.join(param_parts)}'"
             )
             return None
         # No parameters needed for clear
@@ -126,3 +130,4 @@ def parse_mqtt_message(message):
     else:
         print(f"Error: Unknown command '{command}' for namespace '{namespace}'.")
         return None
+